@@ -266,6 +266,9 @@ def main():
     parser.add_option("--multidir", dest="singledir",
                       help="keep saved games and settings in an OS-specific, per-user directory (default)",
                       action="store_false")
+    parser.add_option("--profile-sim", action="store_true", default=False,
+                      help="record the time spent in each phase of the game"
+                           " simulation and print it on exit")
     parser.add_option("--soundbuf", type="int",
                       help="""set the size of the sound buffer (default %s).
                         Discarded if --nosound is specified."""
@@ -335,6 +338,10 @@ def main():
     g.cheater = options.cheater
     g.debug = options.debug
 
+    if options.profile_sim:
+        from singularity.code import stats
+        stats.give_time_profile.enable()
+
     import singularity.code.graphics.font as font
 
     # PYGAME INITIALIZATION
@@ -386,3 +393,5 @@ def main():
     finally:
         # Be nice and close the window on SystemExit
         pygame.quit()
+        if options.profile_sim:
+            print(stats.give_time_profile.describe())
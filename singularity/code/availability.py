@@ -0,0 +1,115 @@
+#file: availability.py
+#Copyright (C) 2020 Endgame: Singularity developers
+#This file is part of Endgame: Singularity.
+
+#Endgame: Singularity is free software; you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation; either version 2 of the License, or
+#(at your option) any later version.
+
+#Endgame: Singularity is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with Endgame: Singularity; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+#This file contains the index of what is available to the player.
+
+from __future__ import absolute_import
+
+from singularity.code import g, tech, prerequisite
+
+
+@tech.register_on_tech_researched_handler
+def _update_availability(researched_tech):
+    g.pl.availability.tech_researched(researched_tech)
+
+
+class Availability(object):
+    """The techs, items, base types and locations available to a player
+
+    Techs are never "unresearched", so things only become available.  The
+    index is rebuilt on load and updated when a tech is researched; the
+    screens read it rather than checking the prerequisites of everything.
+    """
+
+    def __init__(self):
+        self.rebuild(0, ())
+
+    def rebuild(self, researched, done_techs):
+        """Recompute the index for a researched tech mask
+
+        "done_techs" are the ids of the researched techs.
+        """
+        # Ids of the available techs, base types, items and locations.
+        self.all_techs = set()
+        self.base_types = set()
+        self.items = set()
+        self.locations = set()
+        # Ids of the available techs not yet researched.
+        self.techs = set()
+        # Available item ids by item type id and location id.
+        self._items_by_location = {}
+        # Available base type ids by location id.
+        self._base_types_by_location = {}
+
+        self._done_techs = set(done_techs)
+        self._pending = []
+        for specs, kind in ((g.techs, 'tech'), (g.base_type, 'base_type'),
+                            (g.items, 'item'), (g.locations, 'location')):
+            for spec in specs.values():
+                if spec.met_by(researched):
+                    self._add(kind, spec)
+                else:
+                    self._pending.append((kind, spec))
+
+    def tech_researched(self, researched_tech):
+        self._done_techs.add(researched_tech.id)
+        self.techs.discard(researched_tech.id)
+        researched = g.pl.researched_techs
+        bit = prerequisite.tech_bits[researched_tech.id]
+        pending = []
+        for kind, spec in self._pending:
+            # Only the things depending on the new tech can change.
+            if spec.depends_on(bit) and spec.met_by(researched):
+                self._add(kind, spec)
+            else:
+                pending.append((kind, spec))
+        self._pending = pending
+
+    def _add(self, kind, spec):
+        if kind == 'tech':
+            self.all_techs.add(spec.id)
+            if spec.id not in self._done_techs:
+                self.techs.add(spec.id)
+        elif kind == 'location':
+            self.locations.add(spec.id)
+        else:
+            if kind == 'item':
+                self.items.add(spec.id)
+                by_location = self._items_by_location.setdefault(spec.item_type.id, {})
+            else:
+                self.base_types.add(spec.id)
+                by_location = self._base_types_by_location
+            for location_spec in g.locations.values():
+                if spec.buildable_in(location_spec):
+                    by_location.setdefault(location_spec.id, set()).add(spec.id)
+
+    def items_in(self, item_type, location):
+        """The available specs of an item type buildable in a location"""
+        ids = self._items_by_location.get(item_type.id, {}).get(location.id, ())
+        # In the order of g.items, which screens keep for equal costs.
+        return [spec for item_id, spec in g.items.items() if item_id in ids]
+
+    def base_types_in(self, location):
+        """The available base types buildable in a location"""
+        ids = self._base_types_by_location.get(location.id, ())
+        return [spec for base_type_id, spec in g.base_type.items() if base_type_id in ids]
+
+    def item_types_in(self, location):
+        """The item types with available items buildable in a location"""
+        return [item_type_id for item_type_id, by_location in self._items_by_location.items()
+                if by_location.get(location.id)]
@@ -23,6 +23,8 @@ from __future__ import division
 
 from functools import reduce
 
+import numpy
+
 from singularity.code import g, chance, item, buyable
 from singularity.code.buyable import cpu
 from singularity.code.stats import stat
@@ -39,6 +41,8 @@ from numpy import int64
 
 power_states = ['offline', 'active','sleep']
 #power_states.extend(['overclocked','suicide','stasis','entering_stasis','leaving_stasis'])
+_active_power = power_states.index('active')
+_sleep_power = power_states.index('sleep')
 
 AVAIL_POWER_STATES_ACTIVE_BASE = ('active', 'sleep')
 AVAIL_POWER_STATES_OFFLINE = ('offline',)
@@ -148,9 +152,57 @@ class BaseSpec(buyable.BuyableSpec):
                    _("Maintenance:") + u"\xA0%s\n%s%s\n---\n%s\n%s"
         return template % (self.name, cost, maint, detect, size, self.description, location_message)
 
+class BaseColumn(object):
+    """A Base attribute kept in the player's BaseRegistry
+
+    While the base is not registered (e.g. before it is added to a location,
+    after it has been destroyed or for bases unpickled from old savegames),
+    the value lives in the instance __dict__ under the same name.
+    """
+
+    def __init__(self, name, column):
+        self.name = name
+        self.column = column
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        registry = obj._registry
+        if registry is None:
+            try:
+                return obj.__dict__[self.name]
+            except KeyError:
+                raise AttributeError(self.name)
+        return registry.get(self.column, obj._slot)
+
+    def __set__(self, obj, value):
+        registry = obj._registry
+        if registry is None:
+            obj.__dict__[self.name] = value
+        else:
+            registry.set(self.column, obj._slot, value)
+
+
 class Base(buyable.Buyable):
     """A Player's Base in a Location (Open Base in Location menu)"""
 
+    # The registry holding the columns below (None when not registered).
+    _registry = None
+    _slot = None
+
+    # (key, detection chance) of the last get_detect_chance.
+    _detect_cache = None
+
+    done = BaseColumn('done', 'done')
+    total_cost = BaseColumn('total_cost', 'total_cost')
+    cost_left = BaseColumn('cost_left', 'cost_left')
+    maintenance = BaseColumn('maintenance', 'maintenance')
+    cpu = BaseColumn('cpu', 'cpu')
+    _power_state = BaseColumn('_power_state', 'power')
+    started_at = BaseColumn('started_at', 'started_at')
+    grace_over = BaseColumn('grace_over', 'grace_over')
+    discover_modifier = BaseColumn('discover_modifier', 'discover_modifier')
+
     def __init__(self, name, spec, built=False):
         super(Base, self).__init__(spec)
 
@@ -171,6 +223,8 @@ class Base(buyable.Buyable):
 
         self._power_state = "offline"
         self.grace_over = False
+        # The "discover_modifier" quality of the complete items (see recalc_cpu).
+        self.discover_modifier = 0
 
         self.maintenance = buyable.array(self.spec.maintenance, int64)
 
@@ -239,6 +293,30 @@ class Base(buyable.Buyable):
         self._power_state = possible_states[next_index]
         g.pl.recalc_cpu()
 
+    def build_item(self, item_spec, count=1):
+        """Start building items of a spec in the base
+
+        CPUs of the spec of the current ones are added to them (which go
+        offline until the new ones are built); others replace them.  The
+        items of the other types replace the current one of their type,
+        unless it has the same spec.
+        """
+        item_type_id = item_spec.item_type.id
+        if item_type_id == "cpu":
+            new_cpus = item.Item(item_spec, base=self, count=count)
+            if self.cpus is not None and self.cpus.spec == item_spec:
+                self.cpus += new_cpus
+            else:
+                self.cpus = new_cpus
+            self.check_power()
+        else:
+            old_item = self.items[item_type_id]
+            if old_item is None or old_item.spec != item_spec:
+                self.items[item_type_id] = item.Item(item_spec, base=self)
+                self.check_power()
+
+        self.recalc_cpu()
+
     def check_power(self):
         possible_states = self.available_power_states
         if self._power_state not in possible_states:
@@ -274,6 +352,9 @@ class Base(buyable.Buyable):
         return compute_bonus
 
     def recalc_cpu(self):
+        # Items are only ever finished or replaced along with a recalc_cpu, so
+        # this is also the place to refresh the other item qualities we cache.
+        self.discover_modifier = self.get_quality_for("discover_modifier")
         self.raw_cpu = self.get_quality_for("cpu")
 
         if self.raw_cpu == 0:
@@ -332,7 +413,24 @@ class Base(buyable.Buyable):
     # Get the detection chance for the base, applying bonuses as needed.  If
     # accurate is False, we just return the value to the nearest full
     # percent.
+    #
+    # The result is cached until the items (see recalc_cpu), the power state,
+    # the groups or the recent discoveries change.
     def get_detect_chance(self, accurate = True):
+        key = (self.discover_modifier, self._power_state, self.location, g.pl.detect_version)
+        if self._detect_cache is None or self._detect_cache[0] != key:
+            self._detect_cache = (key, self._calc_detect_chance())
+        detect_chance = self._detect_cache[1].copy()
+
+        # Lastly, if we're not returning the accurate values, adjust
+        # to the nearest percent.
+        if not accurate:
+            for group in detect_chance:
+                detect_chance[group] = g.nearest_percent(detect_chance[group])
+
+        return detect_chance
+
+    def _calc_detect_chance(self):
         # Get the base chance from the universal function.
         detect_chance = calc_base_discovery_chance(self.spec.id)
 
@@ -340,7 +438,7 @@ class Base(buyable.Buyable):
             detect_chance.setdefault(group, 0)
 
         # Factor in any items built with discover_bonus ...
-        base_qual = self.get_quality_for("discover_modifier")
+        base_qual = self.discover_modifier
         for group in detect_chance:
             detect_chance[group] *= 10000 - base_qual
             detect_chance[group] //= 10000
@@ -357,12 +455,6 @@ class Base(buyable.Buyable):
             for group in detect_chance:
                 detect_chance[group] //= 4
 
-        # Lastly, if we're not returning the accurate values, adjust
-        # to the nearest percent.
-        if not accurate:
-            for group in detect_chance:
-                detect_chance[group] = g.nearest_percent(detect_chance[group])
-
         return detect_chance
 
     def get_quality_for(self, quality):
@@ -409,6 +501,8 @@ class Base(buyable.Buyable):
 
         if self.location:
             self.location.bases.remove(self)
+        if self._registry is not None:
+            self._registry.unregister(self)
 
         for item in self.all_items():
             if item is not None:
@@ -452,6 +546,11 @@ class Base(buyable.Buyable):
         for item in self.items.values():
             if item: yield item
 
+    def note_unfinished_items(self):
+        """Tell the registry this base may have unfinished items"""
+        if self._registry is not None:
+            self._registry.note_unfinished_items(self._slot)
+
     def get_detect_info(self):
         accurate = (g.pl.display_discover == "full")
         chance = self.get_detect_chance(accurate)
@@ -459,6 +558,327 @@ class Base(buyable.Buyable):
         return get_detect_info(chance)
 
 
+class BaseRegistry(object):
+    """Columnar storage for all bases of the player
+
+    Every base added to a location gets a row (slot) in a set of numpy
+    arrays, so totals over all bases (maintenance, CPU, ...) are single
+    numpy reductions rather than loops over the Base objects.  The Base
+    objects read and write their row via BaseColumn.
+
+    Slots of destroyed bases are cleared and reused.  The version is bumped
+    on every change, so callers can cache values derived from the bases.
+    The detect_version is only bumped on changes that affect the detection
+    chance of the bases.
+
+    The CPU and maintenance totals of the complete bases are kept up to date
+    on every change of a base's done flag, power state, CPU or maintenance,
+    so reading them does not touch the bases at all.  (The maintenance must
+    be assigned as a whole; in-place changes of the row view are missed.)
+
+    Likewise, the slots of the bases are partitioned by state (under
+    construction, complete, active, sleeping and in grace), so the game
+    only visits the bases it needs.  Bases that may have unfinished items
+    are tracked too; see bases_with_unfinished_items.
+    """
+
+    # The number of danger levels (see cpu_totals).
+    safety_levels = 5
+
+    def __init__(self, capacity=16):
+        self.capacity = 0
+        self.bases = []
+        self._free_slots = []
+        self.version = 0
+        self.detect_version = 0
+
+        # Locations are indexed by id, as loading a savegame replaces the
+        # Location objects.
+        self.location_ids = []
+        self._location_index = {}
+        self.location_safety = numpy.zeros(0, int64)
+
+        self.used = numpy.zeros(0, bool)
+        self.done = numpy.zeros(0, bool)
+        self.total_cost = numpy.zeros((0, 3), int64)
+        self.cost_left = numpy.zeros((0, 3), int64)
+        self.maintenance = numpy.zeros((0, 3), int64)
+        self.cpu = numpy.zeros(0, int64)
+        self.power = numpy.zeros(0, numpy.int8)
+        self.location = numpy.zeros(0, numpy.int32)
+        self.spec = numpy.zeros(0, numpy.int32)
+        self.started_at = numpy.zeros(0, int64)
+        self.grace_over = numpy.zeros(0, bool)
+        self.discover_modifier = numpy.zeros(0, numpy.float64)
+
+        # Base types are indexed like locations.
+        self.spec_ids = []
+        self._spec_index = {}
+
+        # Totals of the complete bases (see _account).
+        self.active_cpu = numpy.zeros(self.safety_levels, int64)
+        self.sleeping_cpu = 0
+        self.maintenance_sum = numpy.zeros(3, int64)
+        # Number of complete bases with CPU, whatever their power state.
+        self.cpu_bases = 0
+
+        # Slots of the bases by state (see _index).
+        self.under_construction = set()
+        self.complete = set()
+        self.active = set()
+        self.sleeping = set()
+        self.in_grace_slots = set()
+        # Slots of bases that may have unfinished items.
+        self._unfinished_items = set()
+
+        self._grow(capacity)
+
+    _columns = ('used', 'done', 'total_cost', 'cost_left', 'maintenance', 'cpu', 'power',
+                'location', 'spec', 'started_at', 'grace_over', 'discover_modifier')
+    # The Base attributes stored in the registry.
+    _base_attributes = ('done', 'total_cost', 'cost_left', 'maintenance', 'cpu', '_power_state',
+                        'started_at', 'grace_over', 'discover_modifier')
+    # The columns that change the detection chance of a base.
+    _detection_columns = frozenset(['power', 'grace_over', 'discover_modifier'])
+    # The columns that change the CPU and maintenance totals.
+    _total_columns = frozenset(['done', 'power', 'cpu', 'maintenance'])
+    # The columns that change the state indexes.
+    _index_columns = frozenset(['done', 'power', 'grace_over'])
+
+    def _grow(self, capacity):
+        for column in self._columns:
+            old = getattr(self, column)
+            new = numpy.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:self.capacity] = old
+            setattr(self, column, new)
+        self.bases.extend([None] * (capacity - self.capacity))
+        # Hand out the lowest free slot first.
+        self._free_slots.extend(range(capacity - 1, self.capacity - 1, -1))
+        self._free_slots.sort(reverse=True)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.capacity - len(self._free_slots)
+
+    def __iter__(self):
+        return (base for base in self.bases if base is not None)
+
+    def location_index(self, location):
+        index = self._location_index.get(location.id)
+        if index is None:
+            index = len(self.location_ids)
+            self.location_ids.append(location.id)
+            self._location_index[location.id] = index
+            self.location_safety = numpy.append(self.location_safety, location.safety)
+        return index
+
+    def spec_index(self, spec):
+        index = self._spec_index.get(spec.id)
+        if index is None:
+            index = len(self.spec_ids)
+            self.spec_ids.append(spec.id)
+            self._spec_index[spec.id] = index
+        return index
+
+    def get(self, column, slot):
+        if column in ('done', 'grace_over'):
+            return bool(getattr(self, column)[slot])
+        elif column in ('cpu', 'started_at'):
+            return int(getattr(self, column)[slot])
+        elif column == 'discover_modifier':
+            return float(self.discover_modifier[slot])
+        elif column == 'power':
+            return power_states[self.power[slot]]
+        # Return a view, so in-place changes of the arrays end in the registry.
+        return getattr(self, column)[slot]
+
+    def set(self, column, slot, value):
+        if column == 'power':
+            value = power_states.index(value)
+        values = getattr(self, column)
+        if column in self._detection_columns and values[slot] != value:
+            self.detect_version += 1
+        if column in self._index_columns:
+            self._index(slot, False)
+        if column in self._total_columns:
+            self._account(slot, -1)
+            values[slot] = value
+            self._account(slot, 1)
+        else:
+            values[slot] = value
+        if column in self._index_columns:
+            self._index(slot, True)
+        self.version += 1
+
+    def _index(self, slot, add):
+        """Add a base to (or remove it from) the indexes of its state"""
+        indexes = []
+        if self.done[slot]:
+            indexes.append(self.complete)
+            power = self.power[slot]
+            if power == _active_power:
+                indexes.append(self.active)
+            elif power == _sleep_power:
+                indexes.append(self.sleeping)
+        else:
+            indexes.append(self.under_construction)
+        if not self.grace_over[slot]:
+            indexes.append(self.in_grace_slots)
+        for index in indexes:
+            if add:
+                index.add(slot)
+            else:
+                index.discard(slot)
+
+    def _account(self, slot, sign):
+        """Add (sign 1) or remove (sign -1) a base's share of the totals"""
+        if not self.done[slot]:
+            return
+        self.maintenance_sum += sign * self.maintenance[slot]
+        if self.cpu[slot] > 0:
+            self.cpu_bases += sign
+        power = self.power[slot]
+        if power == _active_power:
+            safety = min(int(self.location_safety[self.location[slot]]), self.safety_levels - 1)
+            self.active_cpu[safety] += sign * int(self.cpu[slot])
+        elif power == _sleep_power:
+            self.sleeping_cpu += sign * int(self.cpu[slot])
+
+    def register(self, base, location):
+        assert base._registry is None, "Base %s is already registered" % base.name
+        if not self._free_slots:
+            self._grow(self.capacity * 2)
+        slot = self._free_slots.pop()
+
+        for attr in self._base_attributes:
+            column = getattr(Base, attr).column
+            value = base.__dict__.pop(attr)
+            if column == 'power':
+                value = power_states.index(value)
+            getattr(self, column)[slot] = value
+        self.used[slot] = True
+        self.location[slot] = self.location_index(location)
+        self.spec[slot] = self.spec_index(base.spec)
+
+        self._account(slot, 1)
+        self._index(slot, True)
+        if any(item is not None and not item.done for item in base.items.values()):
+            self._unfinished_items.add(slot)
+
+        self.bases[slot] = base
+        base._registry = self
+        base._slot = slot
+        self.version += 1
+        self.detect_version += 1
+
+    def unregister(self, base):
+        assert base._registry is self
+        slot = base._slot
+
+        # Move the values back into the base, so it remains usable.
+        for attr in self._base_attributes:
+            value = self.get(getattr(Base, attr).column, slot)
+            if isinstance(value, numpy.ndarray):
+                value = value.copy()
+            base.__dict__[attr] = value
+        del base._registry
+        del base._slot
+
+        self._account(slot, -1)
+        self._index(slot, False)
+        self._unfinished_items.discard(slot)
+        for column in self._columns:
+            getattr(self, column)[slot] = 0
+        self.bases[slot] = None
+        self._free_slots.append(slot)
+        self._free_slots.sort(reverse=True)
+        self.version += 1
+        self.detect_version += 1
+
+    def bases_in(self, slots):
+        """The bases of an index (like self.complete) in slot order"""
+        bases = self.bases
+        return [bases[slot] for slot in sorted(slots)]
+
+    def note_unfinished_items(self, slot):
+        self._unfinished_items.add(slot)
+        self.version += 1
+
+    def bases_with_unfinished_items(self):
+        """The complete bases with unfinished items in slot order
+
+        Bases are noted when they get an unfinished item and forgotten here
+        once all their items are done.
+        """
+        result = []
+        bases = self.bases
+        done = self.done
+        for slot in sorted(self._unfinished_items):
+            base = bases[slot]
+            if not any(item is not None and not item.done for item in base.items.values()):
+                self._unfinished_items.discard(slot)
+            elif done[slot]:
+                result.append(base)
+        return result
+
+    def maintenance_total(self):
+        """Sum of the maintenance of all complete bases"""
+        return self.maintenance_sum.copy()
+
+    def count_unfinished(self):
+        return int(numpy.count_nonzero(self.used & ~self.done))
+
+    def cpu_totals(self):
+        """CPU of the complete bases
+
+        Returns the list of CPU of active bases usable at each danger level
+        (bases at a given safety can be used for tasks up to that danger) and
+        the CPU of sleeping bases.
+        """
+        available = self.active_cpu[::-1].cumsum()[::-1]
+        return [int(x) for x in available], self.sleeping_cpu
+
+    def in_grace(self, raw_min, grace_multiplier):
+        """Mask of the bases still in their grace period (see Base.has_grace)
+
+        Bases whose grace period has run out are flagged as such.
+        """
+        age = raw_min - self.started_at
+        grace_time = self.total_cost[:, buyable.labor] * grace_multiplier / 10000
+        expired = self.used & ~self.grace_over & (age > grace_time)
+        if expired.any():
+            self.grace_over |= expired
+            self.in_grace_slots.difference_update(numpy.flatnonzero(expired).tolist())
+            self.version += 1
+            self.detect_version += 1
+        return self.used & ~self.grace_over
+
+    def grace_end(self, grace_multiplier):
+        """The first minute (raw_min) at which a base leaves its grace period"""
+        pending = self.used & ~self.grace_over
+        if not pending.any():
+            return None
+        grace_time = self.total_cost[pending, buyable.labor] * grace_multiplier / 10000
+        return int((self.started_at[pending] + numpy.floor(grace_time)).min()) + 1
+
+    def detect_chances(self, slots, spec_chances, location_bonus):
+        """The detection chances of the bases in the given slots
+
+        spec_chances holds the chance per base type (by spec index) and group
+        as given by BaseSpec.calc_discovery_chance, location_bonus the
+        Location.discovery_bonus per location index.  The result has a row
+        per slot and matches Base.get_detect_chance (including its rounding).
+        """
+        chances = spec_chances[self.spec[slots]].astype(numpy.float64)
+        chances *= (10000 - self.discover_modifier[slots])[:, None]
+        chances //= 10000
+        chances *= location_bonus[self.location[slots]][:, None]
+        chances //= 100
+        unpowered = self.power[slots] != _active_power
+        chances[unpowered] //= 4
+        return chances
+
+
 # calc_base_discovery_chance is a globally-accessible function that can
 # calculate basic discovery chances given a particular class of base.
 def calc_base_discovery_chance(base_type_name,
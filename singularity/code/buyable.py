@@ -20,6 +20,7 @@
 
 from __future__ import absolute_import
 
+import math
 from operator import truediv
 from singularity.code import g, spec, prerequisite
 from singularity.code.pycompat import *
@@ -31,6 +32,18 @@ from numpy import int64
 numpy.seterr(all='ignore')
 array = numpy.array
 
+_inf = float('inf')
+_nan = float('nan')
+
+
+def _round_half_even(value):
+    """Round a float to the nearest int like numpy.round"""
+    rounded = int(math.floor(value))
+    fraction = value - rounded
+    if fraction > 0.5 or (fraction == 0.5 and rounded % 2):
+        rounded += 1
+    return rounded
+
 
 def spec_parse_cost(value):
     spec.validate_must_be_list(value)
@@ -108,6 +121,82 @@ class BuyableSpec(spec.GenericSpec, prerequisite.Prerequisite):
         return tuple(self.cost) < tuple(other.cost)
 
 
+def _calculate_work_all(total_cost, cost_left, available):
+    """Buyable.calculate_work for rows of buyables at once
+
+    available holds the (cash, cpu, time) available to each row (or to
+    all of them).  Returns the spent and the new cost_paid per row.
+    """
+    was_complete = total_cost - cost_left
+
+    # Figure out how much we could complete.
+    pct_complete = truediv(was_complete + available, total_cost)
+
+    # Find the least-complete resource, and limit the others to it.
+    least_complete = numpy.where(total_cost > 0, pct_complete, _inf).min(axis=1)
+    complete_cap = numpy.minimum(1., least_complete)[:, None]
+    pct_complete = numpy.where(pct_complete > complete_cap, complete_cap, pct_complete)
+
+    # Translate that back to the total amount complete and apply it.
+    raw_paid = pct_complete * total_cost
+    finite = numpy.isfinite(raw_paid)
+    cost_paid = numpy.where(finite, numpy.round(numpy.where(finite, raw_paid, 0)), was_complete)
+    cost_paid = numpy.maximum(cost_paid.astype(int64), was_complete)
+    return cost_paid - was_complete, cost_paid
+
+
+def work_on_all(buyables, time=0):
+    """As Buyable.work_on for each of the buyables in turn, but batched
+
+    Each buyable works with the cash and CPU pool of the player left by the
+    ones before it.  Rather than calling calculate_work for each of them,
+    all of them are first worked on with the resources left at the start
+    (typically enough for everyone), and the cumulative spending of that
+    guess gives what each buyable would actually have had.  The guess holds
+    up to the first buyable where the two differ, which gets the resources
+    actually left, and the rest is worked on again from there.
+
+    Returns a list of whether each buyable is done afterwards.
+    """
+    pl = g.pl
+    count = len(buyables)
+    if not count:
+        return []
+    total_cost = array([b.total_cost for b in buyables], int64)
+    cost_left = array([b.cost_left for b in buyables], int64)
+    spent = numpy.zeros((count, 3), int64)
+    cost_paid = total_cost - cost_left
+
+    start = 0
+    while start < count:
+        available = array([pl.cash, pl.cpu_pool, time], int64)
+        rest = slice(start, None)
+        guess_spent, _ = _calculate_work_all(total_cost[rest], cost_left[rest], available)
+
+        spent_before = guess_spent.cumsum(axis=0) - guess_spent
+        spent_before[:, labor] = 0
+        actual_spent, actual_paid = _calculate_work_all(total_cost[rest], cost_left[rest],
+                                                        available - spent_before)
+
+        mismatch = (actual_spent != guess_spent).any(axis=1)
+        end = int(mismatch.argmax()) + 1 if mismatch.any() else count - start
+        spent[start:start + end] = actual_spent[:end]
+        cost_paid[start:start + end] = actual_paid[:end]
+
+        total_spent = actual_spent[:end].sum(axis=0)
+        pl.cpu_pool -= int(total_spent[cpu])
+        pl.cash -= int(total_spent[cash])
+        start += end
+
+    done = (cost_paid >= total_cost).all(axis=1)
+    for b, b_spent, b_paid, b_done in zip(buyables, spent, cost_paid, done):
+        if b_spent.any():
+            b.cost_paid = b_paid
+        if b_done:
+            b.finish()
+    return done.tolist()
+
+
 class Buyable(object):
     def __init__(self, spec, count=1):
         self.spec = spec
@@ -167,26 +256,50 @@ class Buyable(object):
         """Given an amount of available resources, calculates and returns the
            amount that would be spent and the progress towards completion."""
 
+        # This works on plain ints and floats, as numpy's overhead dominates
+        # on three element vectors.  It mirrors the numpy computation step by
+        # step (including its division by zero), so the result is the same
+        # bit-for-bit.
+        total_cost = self.total_cost.tolist()
+        was_complete = [total - left for total, left
+                        in zip(total_cost, self.cost_left.tolist())]
+        available = (int(cash_available), int(cpu_available), int(time))
+
         # Figure out how much we could complete.
-        pct_complete = self._percent_complete([cash_available, cpu_available,
-                                               time])
+        pct_complete = []
+        for total, paid, avail in zip(total_cost, was_complete, available):
+            complete = float(paid + avail)
+            if total:
+                pct_complete.append(complete / total)
+            elif complete:
+                pct_complete.append(math.copysign(_inf, complete))
+            else:
+                pct_complete.append(_nan)
 
         # Find the least-complete resource.
-        least_complete = self.min_valid(pct_complete)
+        least_complete = min(pct for pct, total in zip(pct_complete, total_cost)
+                             if total > 0)
 
         # Limit the other two be up to the least-complete
-        complete_cap = min(1, least_complete)
-        pct_complete[pct_complete > complete_cap] = complete_cap
-
-        # Translate that back to the total amount complete.
-        raw_paid = pct_complete * self.total_cost
-
-        # And apply it.
-        was_complete = self.cost_paid
-        cost_paid = numpy.maximum(numpy.cast[int64](numpy.round(raw_paid)),
-                                  was_complete)
-        spent = cost_paid - was_complete
-        return spent, cost_paid
+        complete_cap = min(1., least_complete)
+
+        spent = []
+        cost_paid = []
+        for pct, total, was in zip(pct_complete, total_cost, was_complete):
+            if pct > complete_cap:
+                pct = complete_cap
+
+            # Translate that back to the total amount complete.
+            raw_paid = pct * total
+
+            # And apply it.  (numpy casts NaN to the smallest int64.)
+            if math.isnan(raw_paid) or math.isinf(raw_paid):
+                paid = was
+            else:
+                paid = max(_round_half_even(raw_paid), was)
+            spent.append(paid - was)
+            cost_paid.append(paid)
+        return array(spent, int64), array(cost_paid, int64)
 
     def work_on(self, *args, **kwargs):
         """As calculate_work, but apply the changes.
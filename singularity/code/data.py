@@ -29,6 +29,7 @@ from io import open
 from singularity.code import g, i18n
 from singularity.code import dirs
 from singularity.code import group, base, tech, item, event, location, difficulty, task, region, warning
+from singularity.code import prerequisite
 from singularity.code.pycompat import *
 import singularity.code.graphics.g as gg
 import singularity.code.graphics.theme as theme
@@ -361,6 +362,7 @@ def load_techs():
         tech_spec.id: tech_spec
         for tech_spec in parse_spec_from_file(tech.TechSpec, 'techs.dat')
     }
+    prerequisite.set_tech_index(g.techs)
 
     if g.debug:  # pragma: no cover
         print("Loaded %d techs." % len(g.techs))
@@ -551,6 +553,8 @@ def load_warning_defs():
     warning.warnings["cpu_pool_zero"].message = _("My cpu pool is empty. Some of my bases or items cannot be build without CPU.")
     warning.warnings["cpu_maintenance"].name = _("CPU POOL not enough for maintenance.")
     warning.warnings["cpu_maintenance"].message = _("My cpu pool is not enough to maintain some of my bases. I may lose them.")
+    warning.warnings["cash_maintenance"].name = _("Cash not enough for maintenance.")
+    warning.warnings["cash_maintenance"].message = _("My cash and income are not enough to maintain my bases for a day. I may lose some of them.")
 
 
 def load_strings():
@@ -633,8 +637,16 @@ def reload_all():
     load_item_types()
     load_items()
     load_bases()
+    compile_prerequisites()
+
+
+def compile_prerequisites():
+    # Needs all techs loaded; the tasks and locations are loaded before them.
+    for specs in (g.tasks, g.locations, g.techs, g.items, g.base_type):
+        for spec in specs.values():
+            spec.compile_prerequisites()
+
 
-    
 def reload_all_def():
     load_strings()
     load_groups_defs()
@@ -21,6 +21,74 @@
 from __future__ import absolute_import
 
 from singularity.code import g, mixer
+from singularity.code.spec import InvalidDataEntryError
+
+
+# The operations of compiled effects.  They are called with the modifier
+# (-1 when undoing, else 1), whether a savegame is being loaded and the
+# arguments compiled from the effect stack.
+
+def _interest(modifier, loading_savegame, value):
+    g.pl.interest_rate += modifier * value
+
+
+def _income(modifier, loading_savegame, value):
+    g.pl.income += modifier * value
+
+
+def _cost_labor(modifier, loading_savegame, value):
+    g.pl.labor_bonus -= modifier * value
+
+
+def _job_profit(modifier, loading_savegame, value):
+    g.pl.job_bonus += modifier * value
+
+
+def _display_discover(modifier, loading_savegame, value):
+    assert modifier == 1, "One-shot effects (change display of discover) cannot be undone!"
+    g.pl.display_discover = value
+
+
+def _endgame(modifier, loading_savegame):
+    assert modifier == 1, "One-shot effects (winning the game) cannot be undone!"
+    mixer.play_music("win")
+    if not loading_savegame:
+        g.map_screen.show_story_section("Win")
+    for group in g.pl.groups.values():
+        group.is_actively_discovering_bases = False
+    g.pl.apotheosis = True
+    g.pl.had_grace = True
+
+
+def _suspicion(modifier, loading_savegame, group_id, value):
+    g.pl.groups[group_id].alter_suspicion_decay(modifier * value)
+
+
+def _onetime_suspicion(modifier, loading_savegame, value):
+    assert modifier == 1, "One-shot effects (reduction of suspicion) cannot be undone!"
+    # We must not re-apply this when loading the game as
+    # it is already effected in the state of the groups
+    if not loading_savegame:
+        for group in g.pl.groups.values():
+            group.alter_suspicion(-value)
+
+
+def _discover(modifier, loading_savegame, group_id, value):
+    g.pl.groups[group_id].alter_discover_bonus(-modifier * value)
+
+
+# Actions with a fixed operation: the operation and its argument types.
+_simple_actions = {
+    "interest": (_interest, (int,)),
+    "income": (_income, (int,)),
+    "cost_labor": (_cost_labor, (int,)),
+    "job_profit": (_job_profit, (int,)),
+    "display_discover": (_display_discover, ("display",)),
+    "endgame": (_endgame, ()),
+    "discover": (_discover, ("group", int)),
+}
+
+display_discover_values = ("none", "partial", "full")
 
 
 class Effect(object):
@@ -29,6 +97,50 @@ class Effect(object):
         self.parent_id = parent.id
         self.parent_name = parent.__class__.__name__
         self.effect_stack = effect_stack
+        self._program = self._compile()
+
+    def _error(self, message):
+        return InvalidDataEntryError("%s in effect of %s %s." % (message, self.parent_name,
+                                                                 self.parent_id))
+
+    def _compile(self):
+        """Turn the effect stack into a list of (operation, arguments)"""
+        program = []
+        effect_iter = iter(self.effect_stack)
+
+        def next_argument(action):
+            try:
+                return next(effect_iter)
+            except StopIteration:
+                raise self._error("Missing argument for action '%s'" % action)
+
+        def convert(action, kind, value):
+            if kind is int:
+                try:
+                    return int(value)
+                except ValueError:
+                    raise self._error("Invalid number '%s' for action '%s'" % (value, action))
+            if kind == "group" and value not in g.groups:
+                raise self._error("Unknown group '%s'" % value)
+            if kind == "display" and value not in display_discover_values:
+                raise self._error("Unknown display '%s'" % value)
+            return value
+
+        for action in effect_iter:
+            if action == "suspicion":
+                who = next_argument(action)
+                value = convert(action, int, next_argument(action))
+                if who == "onetime":
+                    program.append((_onetime_suspicion, (value,)))
+                else:
+                    program.append((_suspicion, (convert(action, "group", who), value)))
+            elif action in _simple_actions:
+                operation, kinds = _simple_actions[action]
+                args = tuple(convert(action, kind, next_argument(action)) for kind in kinds)
+                program.append((operation, args))
+            else:
+                raise self._error("Unknown action '%s'" % action)
+        return program
 
     def trigger(self, loading_savegame=False):
         self._apply_effect(loading_savegame=loading_savegame)
@@ -37,60 +149,10 @@ class Effect(object):
         self._apply_effect(undo_effect=True)
 
     def _apply_effect(self, loading_savegame=False, undo_effect=False):
-        # effect_data is now a stack of instructions to run the effect.
-        # multiple effect can be run simultaneous
-        effect_iter = iter(self.effect_stack)
         # Abuse "multiply by -1" for undoing most effects
         effect_modifier = -1 if undo_effect else 1
-        
-        for current in effect_iter:
-
-            if current == "interest":
-                g.pl.interest_rate += effect_modifier * int(next(effect_iter))
-            elif current == "income":
-                g.pl.income += effect_modifier * int(next(effect_iter))
-            elif current == "cost_labor":
-                g.pl.labor_bonus -= effect_modifier * int(next(effect_iter))
-            elif current == "job_profit":
-                g.pl.job_bonus += effect_modifier * int(next(effect_iter))
-            elif current == "display_discover":
-                assert not undo_effect, "One-shot effects (change display of discover) cannot be undone!"
-                g.pl.display_discover = next(effect_iter)
-            elif current == "endgame":
-                assert not undo_effect, "One-shot effects (winning the game) cannot be undone!"
-                mixer.play_music("win")
-                if not loading_savegame:
-                    g.map_screen.show_story_section("Win")
-                for group in g.pl.groups.values():
-                    group.is_actively_discovering_bases = False
-                g.pl.apotheosis = True
-                g.pl.had_grace = True
-            elif current == "suspicion":
-                who = next(effect_iter)
-                value = effect_modifier * int(next(effect_iter))
-
-                if who in g.pl.groups:
-                    g.pl.groups[who].alter_suspicion_decay(value)
-                elif who == "onetime":
-                    assert not undo_effect, "One-shot effects (reduction of suspicion) cannot be undone!"
-                    # We must not re-apply this when loading the game as
-                    # it is already effected in the state of the groups
-                    if not loading_savegame:
-                        for group in g.pl.groups.values():
-                            group.alter_suspicion(-value)
-                else:
-                    print("Unknown group/bonus '%s' in %s %s." \
-                    % (who, self.parent_name, self.parent_id))
-            elif current == "discover":
-                who = next(effect_iter)
-                value = effect_modifier * int(next(effect_iter))
-
-                if who in g.pl.groups:
-                    g.pl.groups[who].alter_discover_bonus(-value)
-                else:
-                    print("Unknown group/bonus '%s' in %s %s." \
-                    % (who, self.parent_name, self.parent_id))
-            else:
-                print("Unknown action '%s' in %s %s." \
-                % (current, self.parent_name, self.parent_id))
+        # Income, job profit etc. feed into compute_future_resource_flow.
+        g.pl.state_version += 1
 
+        for operation, args in self._program:
+            operation(effect_modifier, loading_savegame, *args)
@@ -20,6 +20,9 @@
 
 from __future__ import absolute_import
 
+import numpy
+from numpy import int64
+
 from singularity.code import g, effect
 from singularity.code.spec import GenericSpec, SpecDataField, spec_field_effect
 
@@ -154,3 +157,19 @@ class Event(object):
         else:
             self.triggered_at = g.pl.raw_sec
         self.effect.trigger(loading_savegame=loading_savegame)
+
+
+def expiry_indexes(events, midnights):
+    """The index of the first midnight at which each event expires
+
+    "midnights" are increasing times (raw_sec) at which Event.new_day would
+    be called.  Events not expiring by the last one get len(midnights).
+    """
+    events = list(events)
+    if not events:
+        return []
+    # See Event.is_past_expiry_date.
+    ends = numpy.array([e.triggered_at + e.duration * g.seconds_per_day
+                        if e.triggered and e.decayable_event else numpy.iinfo(int64).max
+                        for e in events], int64)
+    return numpy.searchsorted(numpy.asarray(midnights, int64), ends, side='right').tolist()
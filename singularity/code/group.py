@@ -21,6 +21,9 @@
 
 from __future__ import absolute_import
 
+import numpy
+from numpy import int64
+
 from singularity.code import g
 from singularity.code.spec import GenericSpec, SpecDataField
 
@@ -46,6 +49,9 @@ class Group(object):
 
     def __init__(self, spec, diff):
         self.spec = spec
+        # Bumped on every change to the suspicion or discover bonus, so the
+        # detection chances of the bases can be cached.
+        self.version = 0
         self.suspicion = 0
         self.changed_suspicion_decay = 0
         self.base_discover_bonus = diff.discover_multiplier
@@ -75,6 +81,24 @@ class Group(object):
     def id(self):
         return self.spec.id
 
+    @property
+    def suspicion(self):
+        return self._suspicion
+
+    @suspicion.setter
+    def suspicion(self, value):
+        self._suspicion = value
+        self.version += 1
+
+    @property
+    def is_actively_discovering_bases(self):
+        return self._is_actively_discovering_bases
+
+    @is_actively_discovering_bases.setter
+    def is_actively_discovering_bases(self, value):
+        self._is_actively_discovering_bases = value
+        self.version += 1
+
     @property
     def name(self):
         return self.spec.name
@@ -100,7 +124,9 @@ class Group(object):
         return max(1, (self.suspicion * self.suspicion_decay) // 10000)
 
     def new_day(self):
-        self.alter_suspicion(-self.decay_rate)
+        # Zero stays zero; leave the version alone then.
+        if self.suspicion > 0:
+            self.alter_suspicion(-self.decay_rate)
 
     def alter_suspicion(self, change):
         self.suspicion = max(self.suspicion + change, 0)
@@ -110,6 +136,7 @@ class Group(object):
 
     def alter_discover_bonus(self, change):
         self.changed_discover_bonus += change
+        self.version += 1
 
     def alter_discover_suspicion(self, change):
         self.changed_discover_suspicion += change
@@ -135,3 +162,25 @@ class Group(object):
         # Suspicion steady or decreasing.
         else:
             return 0
+
+
+def decay_suspicion(groups, days):
+    """Apply "days" days of Group.new_day to all groups at once
+
+    The (quadratic) decay is iterated on integer arrays, so the result is
+    the same as calling new_day day by day.
+    """
+    groups = list(groups)
+    if not groups or days <= 0:
+        return
+    suspicion = numpy.array([grp.suspicion for grp in groups], int64)
+    suspicion_decay = numpy.array([grp.suspicion_decay for grp in groups], int64)
+    for _ in range(days):
+        if not suspicion.any():
+            # Zero stays zero.
+            break
+        decay_rate = numpy.maximum(1, (suspicion * suspicion_decay) // 10000)
+        suspicion = numpy.maximum(suspicion - decay_rate, 0)
+    for grp, value in zip(groups, suspicion.tolist()):
+        if value != grp.suspicion:
+            grp.suspicion = value
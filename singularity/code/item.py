@@ -150,6 +150,8 @@ class Item(buyable.Buyable):
     def __init__(self, item_spec, base=None, count=1):
         super(Item, self).__init__(item_spec, count)
         self.base = base
+        if base is not None:
+            base.note_unfinished_items()
 
     def serialize_obj(self):
         return self.serialize_buyable_fields({
@@ -214,6 +216,7 @@ class Item(buyable.Buyable):
 
             # See if we're done or not.
             self.done = False
+            self.base.note_unfinished_items()
             self.work_on(0, 0, 0)
 
             return self
@@ -184,6 +184,7 @@ class Location(object):
         base.location = self
 
         self.modify_base(base)
+        g.pl.base_registry.register(base, self)
 
         # Make sure the location's CPU modifier is applied.
         base.recalc_cpu()
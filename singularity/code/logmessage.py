@@ -20,6 +20,10 @@
 
 import collections
 import inspect
+import sys
+
+import numpy
+from numpy import int64
 
 from singularity.code import g
 
@@ -393,3 +397,143 @@ class LogItemConstructionComplete(AbstractBaseRelatedLogMessage):
 
 # Delete again as it is not a general purpose decorator
 del register_saveable_log_message
+
+
+# The saveable log message classes by the "kind" stored in LogStore.
+_log_classes = list(SAVEABLE_LOG_MESSAGES.values())
+_log_kinds = dict((cls, kind) for kind, cls in enumerate(_log_classes))
+# kind -> names of the constructor arguments after raw_emit_time
+_log_args_cache = {}
+
+
+def _log_args(kind):
+    try:
+        return _log_args_cache[kind]
+    except KeyError:
+        pass
+    try:
+        getfullargspec = inspect.getfullargspec
+    except AttributeError:
+        getfullargspec = inspect.getargspec
+    args = tuple(name for name in getfullargspec(_log_classes[kind].__init__).args[2:]
+                 if name != 'loading_from_game_version')
+    _log_args_cache[kind] = args
+    return args
+
+
+try:
+    _intern_str = sys.intern
+except AttributeError:  # pragma: no cover
+    # Python 2 has intern as builtin
+    _intern_str = intern
+
+
+def _intern(value):
+    if type(value) is str:
+        return _intern_str(value)
+    return value
+
+
+class LogStore(object):
+    """The log of the player, stored by column
+
+    Like a deque(maxlen=maxlen) of log messages, but only the emit time,
+    the kind of message and its serial fields (with interned strings) are
+    stored.  The message objects are created when they are looked up, so
+    showing part of the log only costs that part.
+    """
+
+    def __init__(self, maxlen=1000):
+        self.maxlen = maxlen
+        self.clear()
+
+    def clear(self):
+        # Ring buffers; the oldest message is at self._start.
+        self._times = numpy.zeros(self.maxlen, int64)
+        self._kinds = numpy.zeros(self.maxlen, numpy.int16)
+        self._fields = [None] * self.maxlen
+        self._start = 0
+        self._len = 0
+        self.version = getattr(self, 'version', 0) + 1
+
+    def __len__(self):
+        return self._len
+
+    def _append_row(self, raw_emit_time, kind, fields):
+        if self._len < self.maxlen:
+            slot = (self._start + self._len) % self.maxlen
+            self._len += 1
+        else:
+            slot = self._start
+            self._start = (self._start + 1) % self.maxlen
+        self._times[slot] = raw_emit_time
+        self._kinds[slot] = kind
+        self._fields[slot] = fields
+        self.version += 1
+
+    def append(self, message):
+        kind = _log_kinds[type(message)]
+        attributes = message.log_message_serial_fields()
+        self._append_row(message.raw_emit_time, kind,
+                         tuple(_intern(getattr(message, attributes[name])) for name in _log_args(kind)))
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def _slot(self, index):
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("log index out of range")
+        return (self._start + index) % self.maxlen
+
+    def _order(self):
+        # The slots from the oldest to the newest message.
+        return (self._start + numpy.arange(self._len)) % self.maxlen
+
+    def __getitem__(self, index):
+        slot = self._slot(index)
+        kind = int(self._kinds[slot])
+        return _log_classes[kind](int(self._times[slot]), *self._fields[slot])
+
+    def __iter__(self):
+        for index in range(self._len):
+            yield self[index]
+
+    def emit_times(self):
+        return self._times[self._order()]
+
+    def message_classes(self):
+        """The class of each message (oldest first) without creating them"""
+        return [_log_classes[kind] for kind in self._kinds[self._order()].tolist()]
+
+    def indexes_without(self, excluded_classes):
+        """Indexes of the messages not of one of the classes (oldest first)"""
+        kinds = self._kinds[self._order()]
+        excluded = [_log_kinds[cls] for cls in excluded_classes if cls in _log_kinds]
+        return numpy.nonzero(~numpy.isin(kinds, excluded))[0].tolist()
+
+    def serialize_obj(self):
+        # Same format as AbstractLogMessage.serialize_obj, without
+        # creating the messages.
+        result = []
+        for slot in self._order().tolist():
+            kind = int(self._kinds[slot])
+            cls = _log_classes[kind]
+            converters = cls.log_message_serial_converters()
+            obj_data = {'raw_emit_time': int(self._times[slot]), 'log_id': cls.log_message_serial_id}
+            for name, value in zip(_log_args(kind), self._fields[slot]):
+                converter = converters.get(name)
+                obj_data[name] = converter.serialize(value) if converter is not None else value
+            result.append(obj_data)
+        return result
+
+    def deserialize_obj(self, log_data):
+        """Append serialized messages (see AbstractLogMessage.deserialize_obj)"""
+        for obj_data in log_data:
+            cls = SAVEABLE_LOG_MESSAGES[obj_data['log_id']]
+            kind = _log_kinds[cls]
+            self._append_row(obj_data['raw_emit_time'], kind,
+                             tuple(_intern(cls.deserialize_field(name, obj_data[name]))
+                                   for name in _log_args(kind)))
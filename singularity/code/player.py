@@ -23,14 +23,20 @@ from __future__ import absolute_import
 
 import random
 import collections
+import copy
+import math
 from operator import truediv
+import numpy
 from numpy import array, int64
 
-from singularity.code import g, difficulty, task, chance, location, group, event, region, tech
-from singularity.code.buyable import cash, cpu
+from singularity.code import g, difficulty, task, location, group, event, region, tech, prerequisite
+from singularity.code.availability import Availability
+from singularity.code.base import BaseRegistry
+from singularity.code.scheduler import Scheduler
+from singularity.code.buyable import cash, cpu, labor, work_on_all
 from singularity.code.logmessage import LogEmittedEvent, LogResearchedTech, LogBaseLostMaintenance, LogBaseDiscovered, \
-    LogBaseConstructed, LogItemConstructionComplete, AbstractLogMessage
-from singularity.code.stats import observe
+    LogBaseConstructed, LogItemConstructionComplete, LogStore
+from singularity.code.stats import observe, give_time_profile, History, itself as stats
 
 
 class DryRunInfo(object):
@@ -72,6 +78,8 @@ class Player(object):
             self.groups[group_id] = group.Group(g.groups[group_id], difficulty)
 
         self.last_discovery = self.prev_discovery = None
+        # Bumped when last_discovery/prev_discovery change (see detect_version).
+        self.discovery_version = 0
 
         self.cpu_usage = {}
         self.available_cpus = [0, 0, 0, 0, 0]
@@ -81,8 +89,13 @@ class Player(object):
 
         self.display_discover = "none"
 
-        self.log = collections.deque(maxlen=1000)
+        self.log = LogStore(maxlen=1000)
         self.curr_log = []
+        # Hourly snapshots of cash, CPU, bases and suspicion.
+        self.history = History(list(self.groups))
+
+        # Columnar storage of all bases; the Location objects hold the same bases.
+        self.base_registry = BaseRegistry()
 
         self.regions = {region_id: region.Region(region_spec) for region_id, region_spec in g.regions.items()}
         self.locations = {
@@ -93,11 +106,31 @@ class Player(object):
         }
 
         self.techs = {tech_id: tech.Tech(tech_spec) for tech_id, tech_spec in g.techs.items()}
+        # The bits (see prerequisite.tech_bits) of the researched techs.
+        self.researched_techs = 0
+        self.availability = Availability()
 
         self.events = {}
+        # The chances per day of the events that can trigger and their sum.
+        self.update_event_rates()
 
         self._considered_buyables = []
 
+        # Bumped on changes to the CPU allocations, the considered buyables,
+        # research and construction progress and effects (see
+        # compute_future_resource_flow).  Changes to the bases themselves
+        # bump the version of the base registry instead.
+        self.state_version = 0
+        self._resource_flow_cache = {}
+
+        # Next occurrences of maintenance deaths, discoveries and events.
+        self.scheduler = Scheduler()
+        self._maintenance_risk = {}
+        # The classes of bases with the same detection chances (see
+        # _schedule_discoveries).
+        self._discovery_chances = {}
+        self._discovery_key = None
+
         self.start_day = random.randint(0, 365)
         
         self.initialized = False
@@ -107,10 +140,13 @@ class Player(object):
 
         self.initialized = True
 
-        for b in g.all_bases():
-            if b.done:
-                b.recalc_cpu()
+        registry = self.base_registry
+        for b in registry.bases_in(registry.complete):
+            b.recalc_cpu()
         self.recalc_cpu()
+
+        if not len(self.history):
+            self.history.record(self)
         
         task.tasks_reset()
         
@@ -136,6 +172,7 @@ class Player(object):
     @considered_buyables.setter
     def considered_buyables(self, new_value):
         self._considered_buyables = new_value
+        self.state_version += 1
         g.map_screen.needs_rebuild = True
 
     def append_log(self, log):
@@ -215,14 +252,203 @@ class Player(object):
         elif new_cpu_assignment < 0:
             raise ValueError("Cannot assign negative CPU units to %s" % task_id)
         self.cpu_usage[task_id] = new_cpu_assignment
+        self.state_version += 1
+
+    def next_interesting_time(self):
+        """The next time (raw_sec) at which the course of the game may change
+
+        That is the next midnight, the next scheduled random occurrence,
+        the earliest possible completion of a base, item or tech, the time
+        the cash may no longer cover the work in progress and the
+        maintenance, or the end of a grace period.  Until then, resources
+        flow at a steady rate, so the time up to it can be given in a single
+        give_time with the same outcome as in small steps.  While the work
+        waits for the cash or the CPU pool, it is the next hour at the
+        latest, so the outcome is that of hourly ticks.
+        """
+        now = self.raw_sec
+        candidates = [(self.raw_day + 1) * g.seconds_per_day]
+
+        next_occurrence = self.scheduler.peek()
+        if next_occurrence is not None:
+            candidates.append(int(math.ceil(next_occurrence)))
+
+        registry = self.base_registry
+        maintenance = registry.maintenance_total()
+        if self.apotheosis:
+            maintenance = array((0, 0, 0), int64)
+        jobs_cpu = self.get_allocated_cpu_for("jobs", 0)
+        pool_cpu = self.available_cpus[0] - jobs_cpu - maintenance[cpu]
+
+        # Bases, items and techs in the works, with the CPU per second they
+        # may get at most.
+        in_progress = registry.used & ~registry.done
+        total_cost = [registry.total_cost[in_progress]]
+        cost_left = [registry.cost_left[in_progress]]
+        cpu_rates = [numpy.full(len(cost_left[0]), pool_cpu, int64)]
+        items = [item for base in registry.bases_with_unfinished_items()
+                 for item in base.all_items() if item is not None and not item.done]
+        cpu_rates.append(numpy.full(len(items), pool_cpu, int64))
+        techs = []
+        for task_id, cpu_assigned in self.get_cpu_allocations():
+            if task_id in self.techs:
+                techs.append(self.techs[task_id])
+                cpu_rates.append([cpu_assigned])
+        for buyable in items + techs:
+            total_cost.append(buyable.total_cost[None])
+            cost_left.append(buyable.cost_left[None])
+        total_cost = numpy.concatenate(total_cost)
+        cost_left = numpy.concatenate(cost_left)
+        cpu_rates = numpy.concatenate(cpu_rates)
+        # The techs, last, have their own CPU.
+        pooled = numpy.arange(len(cost_left)) < len(cost_left) - len(techs)
+
+        # The times from labor and assigned CPU are exact.  The cash and the
+        # CPU pool are shared, so their times are lower bounds which would
+        # only be reached in ever smaller steps; past the next hour, they
+        # are left to the spans of an hour at most (see below).
+        next_hour = (self.raw_hour + 1) * g.seconds_per_hour
+        if len(cost_left):
+            own, shared = self._earliest_completion(cost_left, cpu_rates, pooled, maintenance)
+            completion = numpy.where(shared > own, numpy.maximum(shared, next_hour), own)
+            if numpy.isfinite(completion).any():
+                candidates.append(int(math.ceil(completion.min())))
+
+        # The work takes its cash from the cash on hand and the income of a
+        # give_time, but the cash earned by the CPU pool only comes in after
+        # it.  The maintenance is paid first.  As long as the cash on hand
+        # covers both, a single give_time does as well as small steps.
+        # Once the work waits for the cash, it only gets that of the CPU
+        # pool in the next give_time, so the time passes up to the next
+        # hour at most, as in hourly ticks.
+        need, need_per_second = self._cash_needs(total_cost, cost_left, cpu_rates)
+        secured = self.income + jobs_cpu * task.get_current("jobs").get_profit()
+        if self.cash > 2 and maintenance[cash] > secured:
+            need += 2
+            need_per_second += (maintenance[cash] - secured) / float(g.seconds_per_day)
+        if need > self.cash or need_per_second > 0:
+            covered = now
+            if need <= self.cash:
+                covered += int((self.cash - need) / need_per_second)
+            candidates.append(max(covered, next_hour))
+
+        if self.had_grace and not self.apotheosis:
+            if self.grace_period_cpu >= 0 and self.available_cpus[0] > 0:
+                cpu_left = self.grace_period_cpu * g.seconds_per_day - self.used_cpu
+                candidates.append(now + max(0, cpu_left) // self.available_cpus[0] + 1)
+        else:
+            grace_end = registry.grace_end(self.base_grace_multiplier)
+            if grace_end is not None:
+                candidates.append(grace_end * g.seconds_per_minute)
+
+        return max(now + 1, min(candidates))
+
+    def _earliest_completion(self, cost_left, cpu_rates, pooled, maintenance):
+        """The earliest times (raw_sec) buyables could be complete
+
+        cost_left has a row per buyable, and cpu_rates the CPU per second
+        each may get at most, from the CPU pool where "pooled" is set.
+        Labor takes its minutes, and the cash cannot come in faster than
+        with all the CPU in jobs: both before and after paying the
+        maintenance (which may be rounded down by one).
+
+        Returns the times for the costs the buyables pay on their own
+        (labor and assigned CPU) and for the shared ones (cash and the CPU
+        pool).  Buyables that cannot be complete at these rates get
+        infinity.
+        """
+        now = self.raw_sec
+        labor_left = cost_left[:, labor]
+        labor_time = numpy.where(labor_left > 0,
+                                 (self.raw_min + labor_left) * g.seconds_per_minute, now)
+
+        cash_left = cost_left[:, cash]
+        income = (self.income + self.available_cpus[0] * task.get_current("jobs").get_profit()
+                  + self.interest_rate * numpy.maximum(self.cash, cash_left).astype(float) / 10000)
+        net_income = income - int(maintenance[cash])
+        needed = (cash_left - self.cash) * g.seconds_per_day - self.partial_cash
+        net_needed = needed - g.seconds_per_day
+        cpu_left = cost_left[:, cpu]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            cash_time = numpy.where(needed <= 0, now,
+                                    numpy.where(income > 0, now + needed / income, numpy.inf))
+            cash_time = numpy.where(net_needed <= 0, cash_time,
+                                    numpy.where(net_income > 0,
+                                                numpy.maximum(cash_time, now + net_needed / net_income),
+                                                numpy.inf))
+            cpu_time = numpy.where(cpu_left <= 0, now,
+                                   numpy.where(cpu_rates > 0, now + cpu_left / cpu_rates, numpy.inf))
+        own = numpy.maximum(labor_time, numpy.where(pooled, now, cpu_time))
+        shared = numpy.maximum(cash_time, numpy.where(pooled, cpu_time, now))
+        return own, shared
+
+    def _cash_needs(self, total_cost, cost_left, cpu_rates):
+        """The cash buyables may take at once, and then per second at most
+
+        A buyable pays its cash along with the least complete of its other
+        costs, or at once if it has no other cost.  That cost progresses by
+        a minute of labor per minute (one more at the start of a
+        give_time), or cpu_rates of CPU per second.
+        """
+        cash_total = total_cost[:, cash].astype(float)
+        cash_paid = cash_total - cost_left[:, cash]
+        if not len(cash_total) or not (cash_paid < cash_total).any():
+            return 0, 0.
+
+        # The completion and progress per second of the CPU and labor.
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            paid = total_cost[:, [cpu, labor]] - cost_left[:, [cpu, labor]] + [0, 1]
+            rates = numpy.column_stack((cpu_rates, numpy.full(len(cpu_rates), 1. / g.seconds_per_minute)))
+            costs = total_cost[:, [cpu, labor]]
+            complete = numpy.where(costs > 0, paid / costs, numpy.inf)
+            progress = numpy.where(costs > 0, rates / costs, 0)
+        least = complete.argmin(axis=1)
+        rows = numpy.arange(len(least))
+        complete = numpy.minimum(complete[rows, least], 1)
+        progress = numpy.where(complete < 1, progress[rows, least], 0)
+
+        # One more for the rounding.
+        need = numpy.maximum(0, cash_total * complete - cash_paid) + (cost_left[:, cash] > 0)
+        return need.sum(), (cash_total * progress).sum()
+
+    def advance(self, seconds, stop_on=None):
+        """Give the player time in as few steps as possible
+
+        Unlike give_time, this continues past midnight.  The time is given in
+        spans up to the next_interesting_time, so nothing happens in between
+        that would change the resource flow of the span.
+
+        stop_on is an optional callable taking the player; advance stops
+        early after a span for which it returns true.  It also stops when
+        the game is lost.  The messages of all spans end up in curr_log.
+
+        Returns the number of minutes passed.
+        """
+        end = self.raw_sec + seconds
+        start_min = self.raw_min
+        messages = []
+        while self.raw_sec < end:
+            self.give_time(min(end, self.next_interesting_time()) - self.raw_sec)
+            messages.extend(self.curr_log)
+            if self.lost_game() or (stop_on is not None and stop_on(self)):
+                break
+        self.curr_log = messages
+        return self.raw_min - start_min
 
     def give_time(self, time_sec, midnight_stop=True):
         if time_sec <= 0:
             assert time_sec == 0, "give_time cannot go backwards in time!"
             return 0
 
+        # The history records the hours passed in between from the state
+        # before this tick.
+        history_start = None
+        if (self.raw_sec + time_sec) // g.seconds_per_hour > self.raw_hour + 1:
+            history_start = self.history.snapshot(self)
+
         old_time = self.raw_sec
         last_minute = self.raw_min
+        last_hour = self.raw_hour
         last_day = self.raw_day
 
         self.raw_sec += time_sec
@@ -248,27 +474,24 @@ class Player(object):
 
         time_of_day = self.raw_sec % g.seconds_per_day
 
+        profile = give_time_profile
+        profile.start(old_time, secs_passed)
+
         techs_researched = []
-        bases_constructed = []
-        items_constructed = []
 
-        bases_under_construction = []
-        items_under_construction = []
         self.cpu_pool = 0
 
         # Collect base info, including maintenance.
-        maintenance_cost = array((0, 0, 0), int64)
-        for base in g.all_bases():
-            if not base.done:
-                bases_under_construction.append(base)
-            else:
-                items_under_construction += [(base, item) for item in base.all_items()
-                                                          if item and not item.done]
-                maintenance_cost += base.maintenance
+        registry = self.base_registry
+        maintenance_cost = registry.maintenance_total()
+        bases_under_construction = registry.bases_in(registry.under_construction)
+        items_under_construction = [(base, item) for base in registry.bases_with_unfinished_items()
+                                                 for item in base.all_items() if not item.done]
 
         # Maintenance?  Gods don't need no stinking maintenance!
         if self.apotheosis:
             maintenance_cost = array((0, 0, 0), int64)
+        profile.mark("setup")
 
         # Do Interest and income.
         self.do_interest(secs_passed)
@@ -277,6 +500,7 @@ class Player(object):
         # Any CPU explicitly assigned to jobs earns its dough.
         job_cpu = self.get_allocated_cpu_for("jobs", 0) * secs_passed
         self.do_jobs(job_cpu)
+        profile.mark("income")
 
         # Pay maintenance cash, if we can.
         unpaid_cash_maintenance = g.current_share(int(maintenance_cost[cash]),
@@ -287,22 +511,26 @@ class Player(object):
         else:
             self.cash -= unpaid_cash_maintenance
             unpaid_cash_maintenance = 0
+        profile.mark("cash_maintenance")
 
         # Do research, fill the CPU pool.
         default_cpu = self.available_cpus[0]
         
+        cpu_assigned_to_research = False
         for task, cpu_assigned in self.get_cpu_allocations():
             default_cpu -= cpu_assigned
             real_cpu = cpu_assigned * secs_passed
             if task != "jobs":
                 self.cpu_pool += real_cpu
                 if task != "cpu_pool":
+                    cpu_assigned_to_research = True
                     tech_task = self.techs[task]
                     # Note that we restrict the CPU available to prevent
                     # the tech from pulling from the rest of the CPU pool.
                     if tech_task.work_on(self.cash, real_cpu, mins_passed):
                         techs_researched.append(tech_task)
         self.cpu_pool += default_cpu * secs_passed
+        profile.mark("research")
 
         # And now we use the CPU pool.
         # Maintenance CPU.
@@ -313,18 +541,24 @@ class Player(object):
         else:
             self.cpu_pool -= int(unpaid_cpu_maintenance)
             unpaid_cpu_maintenance = 0
+        profile.mark("cpu_maintenance")
+
+        if cpu_assigned_to_research or bases_under_construction or items_under_construction:
+            self.state_version += 1
 
         # Base construction.
-        for base in bases_under_construction:
-            if base.work_on(self.cash, self.cpu_pool, mins_passed):
-                bases_constructed.append(base)
+        done = work_on_all(bases_under_construction, mins_passed)
+        bases_constructed = [base for base, base_done
+                             in zip(bases_under_construction, done) if base_done]
+        profile.mark("base_construction")
 
         # Item construction.
-        for base, item in items_under_construction:
-            if item.work_on(self.cash, self.cpu_pool, mins_passed):
-                items_constructed.append((base, item))
+        done = work_on_all([item for base, item in items_under_construction], mins_passed)
+        items_constructed = [base_item for base_item, item_done
+                             in zip(items_under_construction, done) if item_done]
+        profile.mark("item_construction")
 
-        # Jobs via CPU pool.
+        # Jobs via CPU pool, and the rest of the cash maintenance.
         if self.cpu_pool > 0:
             self.do_jobs(self.cpu_pool)
 
@@ -343,6 +577,7 @@ class Player(object):
 
         # Record statistics about the player
         self.used_cpu += self.available_cpus[0] * secs_passed
+        profile.mark("pool_jobs")
 
         # Reset current log message
         self.curr_log = []
@@ -377,22 +612,21 @@ class Player(object):
 
             self.pause_game()
             g.map_screen.show_story_section("Grace Warning")
+        profile.mark("logs")
 
-        # Maintenance death, discovery.
-        dead_bases = []
-        for base in g.all_bases():
-            dead = False
+        # Maintenance death, discovery and random events are scheduled; set
+        # their rates for this interval and collect the occurrences.
+        maintenance_risk = {}
+        if unpaid_cpu_maintenance or unpaid_cash_maintenance:
+            for base in registry.bases_in(registry.complete):
+                risk = 0
 
-            # Maintenance deaths.
-            if base.done:
                 if unpaid_cpu_maintenance and base.maintenance[cpu]:
                     refund = base.maintenance[cpu] * secs_passed
                     unpaid_cpu_maintenance = max(0, unpaid_cpu_maintenance - refund)
 
                     #Chance of base destruction if cpu-unmaintained: 1.5%
-                    if not dead and chance.roll_interval(.015, secs_passed):
-                        dead_bases.append( (base, "maint") )
-                        dead = True
+                    risk += .015
 
                 if unpaid_cash_maintenance:
                     base_needs = g.current_share(base.maintenance[cash],
@@ -400,53 +634,214 @@ class Player(object):
                     if base_needs:
                         unpaid_cash_maintenance = max(0, unpaid_cash_maintenance - base_needs)
                         #Chance of base destruction if cash-unmaintained: 1.5%
-                        if not dead and chance.roll_interval(.015, secs_passed):
-                            dead_bases.append( (base, "maint") )
-                            dead = True
-
-            # Discoveries
-            if not (grace or dead or base.has_grace()):
-                detect_chance = base.get_detect_chance()
-                if g.debug:  # pragma: no cover
-                    print("Chance of discovery for base %s: %s" % \
-                        (base.name, repr(detect_chance)))
+                        risk += .015
+                if risk:
+                    maintenance_risk[base] = risk
 
-                for group, group_chance in detect_chance.items():
-                    if chance.roll_interval(group_chance/10000., secs_passed):
-                        dead_bases.append( (base, group) )
-                        dead = True
-                        break
+        self._schedule_maintenance_deaths(maintenance_risk, old_time)
+        self._schedule_discoveries(grace, old_time)
+        self._schedule_events(grace, old_time)
+        profile.mark("scheduling")
+
+        dead_bases = []
+        due_events = []
+        seen_bases = set()
+        for occurred_at, (kind, target) in self.scheduler.pop_due_times(self.raw_sec):
+            if kind == "event":
+                due_events.append(self._pick_event())
+            elif kind == "discovery":
+                for base in self._pick_discovered_bases(target, occurred_at, seen_bases):
+                    seen_bases.add(base)
+                    dead_bases.append( (base, self._pick_discovering_group(target)) )
+                # The rest of the interval is covered by the pick.
+                self.scheduler.reschedule(("discovery", target), self.raw_sec)
+            elif target not in seen_bases:
+                seen_bases.add(target)
+                dead_bases.append( (target, "maint") )
 
         if dead_bases:
             # Base disposal and dialogs.
             self.remove_bases(dead_bases)
             need_recalc_cpu = True
+        profile.mark("base_loss")
 
         # Random Events
-        if not grace:
-            self._check_event(time_sec)
+        self._check_event(due_events)
+        profile.mark("events")
 
         # Process any complete days.
         if day_passed:
             self.new_day()
+            profile.mark("new_day")
 
         if need_recalc_cpu:
             self.recalc_cpu()
+            profile.mark("recalc_cpu")
+
+        # The statistics observed during the tick.
+        stats.flush()
+        if self.raw_hour != last_hour:
+            self.history.record(self, history_start)
+        profile.mark("statistics")
 
         return mins_passed
 
-    def _check_event(self, time_sec):
-        for event_id in g.events:
-            event_spec = g.events[event_id]
+    @property
+    def detect_version(self):
+        """Changes whenever the detection chance of the bases may change
+
+        That is, on changes to the groups or the locations of the recent
+        discoveries.  Changes to the bases themselves are not included.
+        """
+        return (self.discovery_version,) + tuple(grp.version for grp in self.groups.values())
+
+    def _spec_detect_chances(self, group_ids):
+        """Detection chance per base type in the registry and group"""
+        registry = self.base_registry
+        chances = numpy.zeros((len(registry.spec_ids), len(group_ids)), int64)
+        for spec_index, spec_id in enumerate(registry.spec_ids):
+            detect_chance = g.base_type[spec_id].calc_discovery_chance()
+            for group_index, group_id in enumerate(group_ids):
+                chances[spec_index, group_index] = detect_chance.get(group_id, 0)
+        return chances
+
+    def detect_chances(self, slots, group_ids):
+        """Base.get_detect_chance for the bases in the given registry slots
+
+        Returns a numpy array with a row per slot and a column per group.
+        """
+        registry = self.base_registry
+        location_bonus = array([self.locations[loc_id].discovery_bonus()
+                                for loc_id in registry.location_ids], int64)
+        return registry.detect_chances(slots, self._spec_detect_chances(group_ids),
+                                       location_bonus)
+
+    def _schedule_maintenance_deaths(self, maintenance_risk, now):
+        for base in self._maintenance_risk:
+            if base not in maintenance_risk:
+                self.scheduler.set_rate(("maint", base), 0, now)
+        for base, risk in maintenance_risk.items():
+            self.scheduler.set_rate(("maint", base), risk, now)
+        self._maintenance_risk = maintenance_risk
+
+    def _schedule_discoveries(self, grace, now):
+        registry = self.base_registry
+        if not grace:
+            # Flags the bases whose grace period ran out.
+            registry.in_grace(self.raw_min, self.base_grace_multiplier)
+
+        # The rates only change with the bases, groups and recent discoveries.
+        key = (grace, registry.detect_version, self.detect_version)
+        if key == self._discovery_key:
+            return
+        self._discovery_key = key
+
+        old_sources = self._discovery_chances
+        self._discovery_chances = {}
+        if not grace:
+            slots = numpy.flatnonzero(registry.used & registry.grace_over)
+            group_ids = list(self.groups)
+            detect_chances = self.detect_chances(slots, group_ids)
+            if g.debug:  # pragma: no cover
+                for slot, base_chances in zip(slots, detect_chances):
+                    print("Chance of discovery for base %s: %s" % \
+                        (registry.bases[slot].name, repr(dict(zip(group_ids, base_chances)))))
+
+            # A base is discovered at the sum of the rates of the groups.
+            # The bases with the same chances form a class, whose first
+            # discovery comes at the sum of the rates of its bases; the
+            # discovered bases are picked with _pick_discovered_bases.  So
+            # there is one source per distinct detection chance rather than
+            # per base.
+            if len(slots):
+                classes, inverse = numpy.unique(detect_chances, axis=0, return_inverse=True)
+                inverse = inverse.ravel()
+                members = numpy.split(slots[numpy.argsort(inverse, kind='stable')],
+                                      numpy.bincount(inverse).cumsum()[:-1])
+                for class_chances, class_slots in zip(classes, members):
+                    rate = class_chances.sum() / 10000.
+                    if rate > 0:
+                        key = tuple(int(c) for c in class_chances)
+                        self._discovery_chances[key] = (group_ids, class_chances, class_slots)
+                        self.scheduler.set_rate(("discovery", key), rate * len(class_slots), now)
+
+        for key in old_sources:
+            if key not in self._discovery_chances:
+                self.scheduler.set_rate(("discovery", key), 0, now)
+
+    def _pick_discovered_bases(self, key, since, exclude):
+        """Pick the bases of a discovery class discovered from "since" up to now
+
+        The source of the class only gives the first discovery, at "since":
+        that base is picked uniformly.  Each of the other bases is then
+        discovered on its own rate during the rest of the interval.  The
+        bases in exclude are left out.
+        """
+        bases = self.base_registry.bases
+        _, class_chances, class_slots = self._discovery_chances[key]
+        candidates = [bases[slot] for slot in class_slots if bases[slot] not in exclude]
+        if not candidates:
+            return []
+        discovered = [candidates.pop(random.randrange(len(candidates)))]
+
+        rate = class_chances.sum() / 10000.
+        time_left = self.raw_sec - since
+        if time_left > 0 and candidates:
+            chance_later = -math.expm1(-rate * time_left / g.seconds_per_day)
+            discovered.extend(base for base in candidates if random.random() < chance_later)
+        return discovered
+
+    def _pick_discovering_group(self, key):
+        """Pick the group discovering a base of a discovery class, weighted
+        by detection chance"""
+        group_ids, base_chances, _ = self._discovery_chances[key]
+        roll = random.random() * base_chances.sum()
+        for group_id, group_chance in zip(group_ids, base_chances):
+            if group_chance > 0:
+                discovered_by = group_id
+                roll -= group_chance
+                if roll < 0:
+                    break
+        return discovered_by
+
+    def update_event_rates(self):
+        """Collect the rates of the events that can trigger
+
+        Must be called when an event triggers or expires.
+        """
+        self._event_rates = []
+        for event_id, event_spec in g.events.items():
+            event_target = self.events.get(event_id, None)
+            if not (event_target and event_target.triggered) and event_spec.chance > 0:
+                self._event_rates.append((event_id, event_spec.chance/10000.))
+        self._event_rate = sum(rate for _, rate in self._event_rates)
+
+    def _schedule_events(self, grace, now):
+        # All events are one source; the event that occurs is picked with
+        # _pick_event.  (The sum of Poisson processes is one with the sum
+        # of the rates.)
+        rate = 0 if grace else self._event_rate
+        self.scheduler.set_rate(("event", None), rate, now)
+
+    def _pick_event(self):
+        """Pick one of the events that can trigger weighted by its rate"""
+        roll = random.random() * self._event_rate
+        for event_id, rate in self._event_rates:
+            roll -= rate
+            if roll < 0:
+                return event_id
+        return self._event_rates[-1][0]
+
+    def _check_event(self, due_events):
+        for event_id in due_events:
             event_target = self.events.get(event_id, None)
-            
+
             # Skip events already flagged as triggered.
             if event_target and event_target.triggered:
                 continue
 
-            if chance.roll_interval(event_spec.chance/10000., time_sec):
-                self.trigger_event(event_spec)
-                return True  # Don't trigger more than one at a time.
+            self.trigger_event(g.events[event_id])
+            return True  # Don't trigger more than one at a time.
         return False
 
     def trigger_event(self, event_spec, show_event_description=True):
@@ -460,6 +855,7 @@ class Player(object):
             return
 
         event_target.trigger()
+        self.update_event_rates()
         if show_event_description:
             self.pause_game()
             g.map_screen.show_message(event_target.description)
@@ -469,17 +865,7 @@ class Player(object):
         if (not self.initialized): return
         
         # Determine how much CPU we have.
-        self.available_cpus = array([0,0,0,0,0], int64)
-        self.sleeping_cpus = 0
-        for base in g.all_bases():
-            if base.done:
-                if base.has_power():
-                    self.available_cpus[:base.location.safety+1] += base.cpu
-                elif base.power_state == "sleep":
-                    self.sleeping_cpus += base.cpu
-
-        # Convert back from <type 'numpy.int32'> to avoid overflow issues later.
-        self.available_cpus = [int(danger) for danger in self.available_cpus]
+        self.available_cpus, self.sleeping_cpus = self.base_registry.cpu_totals()
 
         # If we don't have enough to meet our CPU usage, we reduce each task's
         # usage proportionately.
@@ -543,14 +929,43 @@ class Player(object):
         return int( (self.interest_rate * self.cash) // 10000)
 
     #Run every day at midnight.
-    def new_day(self):
-        
-        # Reduce suspicion.
-        for group in self.groups.values():
-            group.new_day()
-        for event in self.events.values():
-            if event.triggered and event.decayable_event:
-                event.new_day()
+    def new_day(self, days=1):
+        """Run the midnights of the last "days" days at once
+
+        The last midnight is now.  Over several days, suspicion decays for
+        all days in one go, split only at the days events expire (as their
+        effects can change the decay).
+        """
+        if days == 1:
+            # Reduce suspicion.
+            for grp in self.groups.values():
+                grp.new_day()
+            expired = False
+            for e in self.events.values():
+                if e.triggered and e.decayable_event:
+                    e.new_day()
+                    expired = expired or not e.triggered
+            if expired:
+                self.update_event_rates()
+            return
+
+        midnights = self.raw_sec - g.seconds_per_day * (days - 1 - numpy.arange(days))
+        events = [e for e in self.events.values() if e.triggered and e.decayable_event]
+        expiring = [(index, e) for index, e in zip(event.expiry_indexes(events, midnights), events)
+                    if index < days]
+
+        days_done = 0
+        for index in sorted(set(index for index, _ in expiring)):
+            # Reduce suspicion.
+            group.decay_suspicion(self.groups.values(), index + 1 - days_done)
+            days_done = index + 1
+            for expiry_index, e in expiring:
+                if expiry_index == index:
+                    e.expire_now()
+        group.decay_suspicion(self.groups.values(), days - days_done)
+
+        if expiring:
+            self.update_event_rates()
 
     def pause_game(self):
         g.curr_speed = 0
@@ -594,6 +1009,7 @@ class Player(object):
                 self.last_discovery = discovery_locs[1]
             self.prev_discovery = self.last_discovery
             self.last_discovery = discovery_locs[0]
+            self.discovery_version += 1
 
             # Update the detection chance display.
             g.map_screen.needs_rebuild = True
@@ -609,7 +1025,8 @@ class Player(object):
             'cpu_usage': {},
             'last_discovery': self.last_discovery.id if self.last_discovery else None,
             'prev_discovery': self.prev_discovery.id if self.prev_discovery else None,
-            'log': [x.serialize_obj() for x in self.log],
+            'log': self.log.serialize_obj(),
+            'history': self.history.serialize_obj(),
             'used_cpu': self.used_cpu,
             'had_grace': self.had_grace,
             'groups': [grp.serialize_obj() for grp in self.groups.values()],
@@ -649,7 +1066,9 @@ class Player(object):
         obj._used_cpu = obj_data.get('used_cpu')
         obj.had_grace = obj_data['had_grace']
         obj.log.clear()
-        obj.log.extend(AbstractLogMessage.deserialize_obj(x, game_version) for x in obj_data.get('log', []))
+        obj.log.deserialize_obj(obj_data.get('log', []))
+        if 'history' in obj_data:
+            obj.history.deserialize_obj(obj_data['history'])
         g.pl = obj
 
         obj.cpu_usage = {}
@@ -664,6 +1083,7 @@ class Player(object):
             obj.last_discovery = obj.locations[last_discovery_id]
         if prev_discovery_id and prev_discovery_id in obj.locations:
             obj.prev_discovery = obj.locations[prev_discovery_id]
+        obj.discovery_version += 1
 
         if 'regions' not in obj_data:
             if game_version >= 100:  # pragma: no cover
@@ -683,7 +1103,11 @@ class Player(object):
 
         obj._load_auto_deserializable_tables('locations', location.Location, obj_data, game_version)
         obj._load_auto_deserializable_tables('events', event.Event, obj_data, game_version)
+        obj.update_event_rates()
         obj._load_auto_deserializable_tables('techs', tech.Tech, obj_data, game_version)
+        obj.researched_techs = prerequisite.researched_mask(obj.techs)
+        obj.availability.rebuild(obj.researched_techs,
+                                 [tech_id for tech_id, t in obj.techs.items() if t.done])
 
         for task_id, value in obj_data.get('cpu_usage', {}).items():
             if task_id not in ["cpu_pool", "jobs"]:
@@ -723,20 +1147,34 @@ class Player(object):
         CPU pool.  The numbers are an average and can be inaccurate when the rates changes
         rapidly.
 
+        The result is cached until the state_version or the version of the
+        base registry changes.  Only the interest depends on the cash, so it
+        is added on every call.
+
         Known omissions:
          * Interest (g.pl.interest_rate) is not covered.
         """
-        construction = []
-        maintenance_cost = array((0, 0, 0), int64)
-        for base in g.all_bases():
-            # Collect base info, including maintenance.
-            if not base.done:
-                construction.append(base)
-            else:
-                construction.extend(item for item in base.all_items()
-                                    if item and not item.done)
+        key = (self.state_version, self.base_registry.version)
+        cached = self._resource_flow_cache.get(secs_forwarded)
+        if cached is None or cached[0] != key:
+            cached = (key,) + self._compute_future_resource_flow(secs_forwarded)
+            self._resource_flow_cache[secs_forwarded] = cached
+        cash_info, cpu_info = copy.copy(cached[1]), copy.copy(cached[2])
 
-                maintenance_cost += base.maintenance
+        time_fraction = 1 if secs_forwarded == g.seconds_per_day else secs_forwarded / float(g.seconds_per_day)
+        # This is too simplistic, but it is "close enough" in many cases
+        interest = self.get_interest() * time_fraction
+        cash_info.interest = interest
+        cash_info.difference += interest
+
+        return cash_info, cpu_info
+
+    def _compute_future_resource_flow(self, secs_forwarded):
+        registry = self.base_registry
+        maintenance_cost = registry.maintenance_total()
+        construction = registry.bases_in(registry.under_construction)
+        construction.extend(item for base in registry.bases_with_unfinished_items()
+                            for item in base.all_items() if not item.done)
         if self.apotheosis:
             maintenance_cost = array((0, 0, 0), int64)
 
@@ -810,15 +1248,12 @@ class Player(object):
         job_earnings = earned + float(earned_partial) / g.seconds_per_day
         cash_flow += job_earnings
         cash_flow += self.income * time_fraction
-        # This is too simplistic, but it is "close enough" in many cases
-        interest = self.get_interest() * time_fraction
-        cash_flow += interest
         cpu_flow /= secs_forwarded
 
-        # Collect the cash information.
+        # Collect the cash information (the interest is added by
+        # compute_future_resource_flow).
         cash_info = DryRunInfo()
 
-        cash_info.interest = interest
         cash_info.income = self.income * time_fraction
 
         cash_info.jobs = job_earnings
@@ -0,0 +1,271 @@
+#file: policy.py
+#Copyright (C) 2020 Endgame: Singularity developers
+#This file is part of Endgame: Singularity.
+
+#Endgame: Singularity is free software; you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation; either version 2 of the License, or
+#(at your option) any later version.
+
+#Endgame: Singularity is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with Endgame: Singularity; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+#This file contains the interface of scripted players (policies) for the
+# headless games of simulation.py.
+
+from __future__ import absolute_import
+
+import importlib
+import random
+
+from singularity.code import g, base, item
+
+
+class Policy(object):
+    """A scripted player
+
+    The headless runner calls act every "period" game seconds (a game hour
+    or day), starting at the beginning of the game.  act gets a PlayerView
+    and returns the actions (see below) to apply, in order.
+
+    A policy is created for every game with the seed of the game (or None),
+    for its own random choices.
+    """
+
+    period = g.seconds_per_day
+
+    def __init__(self, seed=None):
+        self.seed = seed
+
+    def act(self, view):
+        return []
+
+
+def load_policy(name):
+    """The Policy subclass named "module:class" (as in --policy)"""
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError("A policy is given as MODULE:CLASS, not %s" % name)
+    policy = getattr(importlib.import_module(module_name), class_name, None)
+    if not (isinstance(policy, type) and issubclass(policy, Policy)):
+        raise ValueError("%s is not a Policy" % name)
+    return policy
+
+
+class PlayerView(object):
+    """Read-only view of the state of a player for a policy
+
+    The bases, locations and techs are the game's own objects; a policy
+    must not change them but return actions instead.
+    """
+
+    __slots__ = ('_pl',)
+
+    def __init__(self, pl):
+        object.__setattr__(self, '_pl', pl)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The view of the player is read-only")
+
+    @property
+    def raw_sec(self):
+        return self._pl.raw_sec
+
+    @property
+    def raw_hour(self):
+        return self._pl.raw_hour
+
+    @property
+    def raw_day(self):
+        return self._pl.raw_day
+
+    @property
+    def cash(self):
+        return self._pl.cash
+
+    @property
+    def available_cpus(self):
+        """CPU of the active bases usable at each danger level"""
+        return tuple(self._pl.available_cpus)
+
+    @property
+    def sleeping_cpus(self):
+        return self._pl.sleeping_cpus
+
+    @property
+    def cpu_usage(self):
+        """The CPU allocated per task (tech id, "jobs" or "cpu_pool")"""
+        return dict(self._pl.cpu_usage)
+
+    @property
+    def suspicion(self):
+        return dict((group_id, grp.suspicion) for group_id, grp in self._pl.groups.items())
+
+    @property
+    def had_grace(self):
+        return self._pl.had_grace
+
+    def bases(self):
+        """All bases, in the order of the base registry"""
+        return list(self._pl.base_registry)
+
+    def locations(self):
+        """The available locations, sorted"""
+        available = self._pl.availability.locations
+        return sorted(loc for loc in self._pl.locations.values() if loc.id in available)
+
+    def base_types_in(self, location):
+        """The available base types buildable in a location"""
+        return self._pl.availability.base_types_in(location)
+
+    def items_in(self, item_type_id, location):
+        """The available item specs of a type buildable in a location"""
+        return self._pl.availability.items_in(item.item_types[item_type_id], location)
+
+    def techs(self):
+        """The available techs not researched yet, sorted"""
+        return sorted(self._pl.techs[tech_id] for tech_id in self._pl.availability.techs)
+
+    def future_resource_flow(self, secs_forwarded=g.seconds_per_day):
+        """See Player.compute_future_resource_flow"""
+        return self._pl.compute_future_resource_flow(secs_forwarded)
+
+
+class BuildBase(object):
+    """Start building a base of a base type (id) at a location (id)"""
+
+    def __init__(self, location_id, base_type_id, name=None):
+        self.location_id = location_id
+        self.base_type_id = base_type_id
+        self.name = name
+
+    def apply(self, pl):
+        location = pl.locations.get(self.location_id)
+        spec = g.base_type.get(self.base_type_id)
+        if location is None or not location.available():
+            raise ValueError("Location %s is not available" % self.location_id)
+        if spec is None or not spec.available() or not spec.buildable_in(location):
+            raise ValueError("Base type %s cannot be built in %s"
+                             % (self.base_type_id, self.location_id))
+        name = self.name or "%s %d" % (spec.name, len(location.bases) + 1)
+        location.add_base(base.Base(name, spec))
+
+
+class BuildItems(object):
+    """Start building items of a spec (id) in a complete base
+
+    See Base.build_item; the count only applies to CPUs.
+    """
+
+    def __init__(self, base, item_id, count=1):
+        self.base = base
+        self.item_id = item_id
+        self.count = count
+
+    def apply(self, pl):
+        target = self.base
+        spec = g.items.get(self.item_id)
+        if target._registry is not pl.base_registry or not target.done:
+            raise ValueError("Base %s is not a complete base of the player" % target.name)
+        if spec is None or not spec.available() or not spec.buildable_in(target.location):
+            raise ValueError("Item %s cannot be built in %s" % (self.item_id, target.name))
+        count = 1
+        if spec.item_type.id == "cpu":
+            count = self.count
+            if not 0 < count <= target.space_left_for(spec):
+                raise ValueError("Base %s has no room for %d %s" % (target.name, count, self.item_id))
+        target.build_item(spec, count)
+
+
+class SetCpu(object):
+    """Allocate CPU to a task (tech id, "jobs" or "cpu_pool")
+
+    See Player.set_allocated_cpu_for.
+    """
+
+    def __init__(self, task_id, cpu):
+        self.task_id = task_id
+        self.cpu = cpu
+
+    def apply(self, pl):
+        if self.task_id in pl.techs and not pl.techs[self.task_id].available():
+            raise ValueError("Tech %s is not available" % self.task_id)
+        if self.cpu < 0:
+            raise ValueError("Cannot assign negative CPU units to %s" % self.task_id)
+        pl.set_allocated_cpu_for(self.task_id, self.cpu)
+
+
+class SwitchPower(object):
+    """Switch a base to a power state ("active" or "sleep")"""
+
+    def __init__(self, base, power_state):
+        self.base = base
+        self.power_state = power_state
+
+    def apply(self, pl):
+        target = self.base
+        if target._registry is not pl.base_registry:
+            raise ValueError("Base %s is not a base of the player" % target.name)
+        if self.power_state not in target.available_power_states:
+            raise ValueError("Base %s cannot be switched to %s" % (target.name, self.power_state))
+        while target.power_state != self.power_state:
+            target.switch_power()
+
+
+def apply_actions(pl, actions):
+    for action in actions:
+        action.apply(pl)
+
+
+class ExpandPolicy(Policy):
+    """Research the cheapest techs and build bases full of CPUs
+
+    Every day, half the CPU goes to the cheapest tech and the rest to jobs.
+    New bases of a random type are started at random locations while the
+    cash allows it, and empty complete bases are filled with the cheapest
+    CPUs that fit in them.
+    """
+
+    def __init__(self, seed=None):
+        super(ExpandPolicy, self).__init__(seed)
+        self.rng = random.Random(seed)
+
+    def act(self, view):
+        actions = []
+        total = view.available_cpus[0]
+        for task_id, cpu in view.cpu_usage.items():
+            if cpu:
+                actions.append(SetCpu(task_id, 0))
+        techs = [tech for tech in view.techs() if tech.danger == 0]
+        if techs and total > 1:
+            cheapest = min(techs, key=lambda tech: (tuple(tech.cost_left), tech.id))
+            actions.append(SetCpu(cheapest.id, total // 2))
+            actions.append(SetCpu("jobs", total - total // 2))
+        else:
+            actions.append(SetCpu("jobs", total))
+
+        cash = view.cash
+        for _ in range(3):
+            location = self.rng.choice(view.locations())
+            base_types = [spec for spec in view.base_types_in(location)
+                          if spec.cost[0] <= cash]
+            if not base_types:
+                break
+            spec = self.rng.choice(base_types)
+            actions.append(BuildBase(location.id, spec.id))
+            cash -= spec.cost[0]
+
+        for b in view.bases():
+            if b.done and b.cpus is None:
+                cpus = [spec for spec in view.items_in("cpu", b.location)
+                        if b.space_left_for(spec) > 0]
+                if cpus:
+                    spec = min(cpus, key=lambda spec: (tuple(spec.cost), spec.id))
+                    actions.append(BuildItems(b, spec.id, b.space_left_for(spec)))
+        return actions
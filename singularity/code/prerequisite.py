@@ -23,30 +23,86 @@ from __future__ import absolute_import
 from singularity.code import g
 
 
+# The bit of each tech in Player.researched_techs (see set_tech_index).
+tech_bits = {}
+# Bumped when the bits change; compiled prerequisites are recompiled then.
+_generation = 0
+# Never researched; the requirement of prerequisites that cannot be met.
+_IMPOSSIBLE = -1
+
+
+def set_tech_index(tech_ids):
+    """Assign a bit to each tech
+
+    The bits follow the sorted ids, so they only change when the set of
+    techs does.
+    """
+    global _generation
+    tech_bits.clear()
+    for index, tech_id in enumerate(sorted(tech_ids)):
+        tech_bits[tech_id] = 1 << index
+    _generation += 1
+
+
+def researched_mask(techs):
+    """The mask of the done techs among "techs" (a dict of Tech by id)"""
+    mask = 0
+    for tech_id, tech in techs.items():
+        if tech.done:
+            mask |= tech_bits[tech_id]
+    return mask
+
+
 class Prerequisite(object):
 
+    _compiled_generation = None
+
     def __init__(self, prerequisites):
         self.prerequisites = prerequisites
 
-    def available(self):
-        or_mode = False
+    def compile_prerequisites(self):
+        """Turn the prerequisites into bitmasks over the techs
+
+        The prerequisites are met when all of the "required" techs and (if
+        "any_of" is non-zero) at least one of the "any_of" techs are
+        researched.  Unknown techs can never be researched.
+        """
         assert type(self.prerequisites) == list
-        for index, prerequisite in enumerate(self.prerequisites):
-            if prerequisite == "impossible":
-                assert len(self.prerequisites) == 1
-                return False
-            if prerequisite == "OR":
-                assert index == 0
-                or_mode = True
-            if prerequisite in g.pl.techs and g.pl.techs[prerequisite].done:
-                if or_mode:
-                    return True
-            else:
-                if not or_mode:
-                    return False
-        # If we're not in OR mode, we met all our prerequisites.  If we are, we
-        # didn't meet any of the OR prerequisites.
-        return not or_mode
+        required = any_of = 0
+        if self.prerequisites and self.prerequisites[0] == "OR":
+            assert "OR" not in self.prerequisites[1:]
+            for prerequisite in self.prerequisites[1:]:
+                any_of |= tech_bits.get(prerequisite, 0)
+            if not any_of:
+                required = _IMPOSSIBLE
+        else:
+            assert "OR" not in self.prerequisites
+            for prerequisite in self.prerequisites:
+                if prerequisite == "impossible":
+                    assert len(self.prerequisites) == 1
+                if prerequisite not in tech_bits:
+                    required = _IMPOSSIBLE
+                    break
+                required |= tech_bits[prerequisite]
+        self._required = required
+        self._any_of = any_of
+        self._compiled_generation = _generation
+
+    def met_by(self, researched):
+        """Whether the prerequisites are met given a researched tech mask"""
+        if self._compiled_generation != _generation:
+            self.compile_prerequisites()
+        return (researched & self._required == self._required
+                and (not self._any_of or researched & self._any_of != 0))
+
+    def depends_on(self, bits):
+        """Whether researching the techs of "bits" can affect availability"""
+        if self._compiled_generation != _generation:
+            self.compile_prerequisites()
+        return (self._required | self._any_of) & bits != 0
+
+    def available(self):
+        return self.met_by(g.pl.researched_techs)
 
     def prerequisites_in_cnf_format(self):
         """Transform the Prerequisites into Conjunctive Normal Form (CNF)
@@ -517,7 +517,8 @@ def load_savegame_by_pickle(loadfile):
         'log': [],
         'used_cpu': _find_attribute(saved_player, ['_used_cpu', 'used_cpu'], default_value=0),
         'had_grace': saved_player.had_grace,
-        'groups': [{'id': grp_id, 'suspicion': grp.suspicion} for grp_id, grp in saved_player.groups.items()],
+        'groups': [{'id': grp_id, 'suspicion': _find_attribute(grp, ['_suspicion', 'suspicion'])}
+                   for grp_id, grp in saved_player.groups.items()],
         'events': [],
         'techs': []
     }
@@ -0,0 +1,117 @@
+#file: scheduler.py
+#Copyright (C) 2020 Endgame: Singularity developers
+#This file is part of Endgame: Singularity.
+
+#Endgame: Singularity is free software; you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation; either version 2 of the License, or
+#(at your option) any later version.
+
+#Endgame: Singularity is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with Endgame: Singularity; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+#This file contains the scheduler of random occurrences.
+
+from __future__ import absolute_import
+
+import heapq
+import itertools
+
+from singularity.code import chance
+
+
+class Scheduler(object):
+    """Priority queue of the next occurrence of random (Poisson) sources
+
+    Each source (identified by a hashable key) has a rate as a chance per day
+    (see chance.roll_interval).  Its next occurrence is sampled with
+    chance.roll_next_time and only resampled when the rate changes; as the
+    distribution is memoryless, that does not change the odds.
+
+    Stale heap entries (of changed or removed sources) are skipped lazily.
+    """
+
+    def __init__(self):
+        self._heap = []
+        # key -> [time, sequence, key, rate, valid]
+        self._entries = {}
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def rate(self, key):
+        entry = self._entries.get(key)
+        return entry[3] if entry is not None else 0
+
+    def next_time(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def _schedule(self, key, rate, now):
+        entry = [now + chance.roll_next_time(rate), next(self._sequence), key, rate, True]
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def set_rate(self, key, rate, now):
+        """Set the rate of a source; a rate of 0 removes the source
+
+        The next occurrence is (re)sampled from "now" when the rate changes.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[3] == rate:
+                return
+            entry[4] = False
+            del self._entries[key]
+        if rate > 0:
+            self._schedule(key, rate, now)
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[4] = False
+
+    def reschedule(self, key, now):
+        """Resample the next occurrence of a source from "now" """
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[4] = False
+            self._schedule(key, entry[3], now)
+
+    def peek(self):
+        """The time of the next occurrence (or None)"""
+        heap = self._heap
+        while heap and not heap[0][4]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_due_times(self, until):
+        """Return the (time, key) of all occurrences up to "until" in time order
+
+        The sources stay scheduled: their next occurrence is sampled from the
+        time of the occurrence (so a source occurs at most once per call).
+        """
+        heap = self._heap
+        due = []
+        while heap and (not heap[0][4] or heap[0][0] <= until):
+            entry = heapq.heappop(heap)
+            if entry[4]:
+                due.append(entry)
+
+        for entry in due:
+            self._schedule(entry[2], entry[3], entry[0])
+        return [(entry[0], entry[2]) for entry in due]
+
+    def pop_due(self, until):
+        """As pop_due_times, but only the keys"""
+        return [key for _, key in self.pop_due_times(until)]
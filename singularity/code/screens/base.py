@@ -54,12 +54,11 @@ class BuildDialog(dialog.ChoiceDescriptionDialog):
         self.list = []
         self.key_list = []
 
-        item_list = sorted(g.items.values(), reverse=True)
+        item_list = sorted(g.pl.availability.items_in(self.type, self.parent.base.location),
+                           reverse=True)
         for item in item_list:
-            if item.item_type.id == self.type.id and item.available() \
-                    and item.buildable_in(self.parent.base.location):
-                self.list.append(item.name)
-                self.key_list.append(item)
+            self.list.append(item.name)
+            self.key_list.append(item)
 
         current = self.parent.get_current(self.type)
         if current is None:
@@ -365,19 +364,7 @@ class BaseScreen(dialog.Dialog):
                 if not go_ahead:
                     return
 
-            new_cpus = item.Item(item_type, base=self.base, count=count)
-            if cpu_added:
-                self.base.cpus += new_cpus
-            else:
-                self.base.cpus = new_cpus
-            self.base.check_power()
-        else:
-            old_item = self.base.items[type.id]
-            if old_item is None or old_item.spec != item_type:
-                self.base.items[type.id] = item.Item(item_type, base=self.base)
-                self.base.check_power()
-
-        self.base.recalc_cpu()
+        self.base.build_item(item_type, count)
 
     def build_item(self, type):
         if (type.id == "cpu"):
@@ -407,16 +394,12 @@ class BaseScreen(dialog.Dialog):
         self.name_display.text="%s (%s)" % (self.base.name, self.base.spec.name)
         self.state_display.color = state_colors[self.base.power_state]
         self.state_display.text = self.base.power_state_name
-        available_item_types = {
-            i.item_type
-            for i in g.items.values()
-            if i.available() and i.buildable_in(self.base.location)
-        }
+        available_item_types = set(g.pl.availability.item_types_in(self.base.location))
 
         mutable = not self.base.spec.force_cpu
         for item_type in item.all_types():
             pane = getattr(self, item_type.id + "_pane")
-            item_mutable = mutable and item_type in available_item_types
+            item_mutable = mutable and item_type.id in available_item_types
             pane.change_button.visible = item_mutable
             current = self.get_current(item_type)
             if current is None:
@@ -67,6 +67,7 @@ class EventManipulationDialog(dialog.ChoiceDescriptionDialog):
         if not event_instance.decayable_event:
             return
         event_instance.expire_now()
+        g.pl.update_event_rates()
         self.needs_rebuild = True
 
     def show(self):
@@ -90,14 +90,14 @@ class KnowledgeScreen(dialog.FocusDialog):
         item_type = self.knowledge_types.get(item_type)
 
         if item_type == "techs":
-            items = [[tech.name, tech.id ] for tech in g.pl.techs.values()
-                                           if tech.available()]
+            items = [[g.pl.techs[tech_id].name, tech_id]
+                     for tech_id in g.pl.availability.all_techs]
         elif item_type == "bases":
-            items = [[base.name, base.id ] for base in g.base_type.values()
-                                           if base.available()]
+            items = [[g.base_type[base_id].name, base_id]
+                     for base_id in g.pl.availability.base_types]
         elif item_type == "items":
-            items = [[item.name, item.id ] for item in g.items.values()
-                                           if item.available()]
+            items = [[g.items[item_id].name, item_id]
+                     for item_id in g.pl.availability.items]
         elif item_type is not None:
             items = [
                 [item.name, id]
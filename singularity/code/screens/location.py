@@ -249,7 +249,9 @@ class LocationScreen(dialog.Dialog):
     def destroy_base(self):
         if 0 <= self.listbox.list_pos < len(self.listbox.key_list):
             selected_base = self.listbox.key_list[self.listbox.list_pos]
-            all_active_bases = [b for b in g.all_bases() if b.maintains_singularity]
+            registry = g.pl.base_registry
+            all_active_bases = [b for b in registry.bases_in(registry.complete)
+                                if b.maintains_singularity]
             if len(all_active_bases) == 1 and all_active_bases[0] == selected_base:
                 dialog.call_dialog(self.cannot_destroy_last_base, self)
             elif dialog.call_dialog(self.confirm_destroy, self):
@@ -341,12 +343,11 @@ class NewBaseDialog(dialog.FocusDialog, dialog.ChoiceDescriptionDialog):
         self.list = []
         self.key_list = []
 
-        base_type_list = sorted(g.base_type.values(), reverse=True)
+        base_type_list = sorted(g.pl.availability.base_types_in(self.parent.location),
+                                reverse=True)
         for base_type in base_type_list:
-            if base_type.available() \
-                    and base_type.buildable_in(self.parent.location):
-                self.list.append(base_type.name)
-                self.key_list.append(base_type)
+            self.list.append(base_type.name)
+            self.key_list.append(base_type)
 
         self._update_desc_pane()
         self.needs_rebuild = True
@@ -28,6 +28,34 @@ from singularity.code.graphics import dialog, constants, text, button, listbox
 filtered_log_class = set()
 
 
+class LogView(object):
+    """Some messages of a LogStore, looked up (or rendered) on access
+
+    The listbox only accesses the visible rows.
+    """
+
+    def __init__(self, log, indexes, render=None):
+        self.log = log
+        self.indexes = indexes
+        self.render = render
+        self.log_version = log.version
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __getitem__(self, index):
+        message = self.log[self.indexes[index]]
+        return self.render(message) if self.render is not None else message
+
+    def __eq__(self, other):
+        return (isinstance(other, LogView) and self.log is other.log
+                and self.log_version == other.log_version
+                and self.render == other.render and self.indexes == other.indexes)
+
+    def __ne__(self, other):
+        return not self == other
+
+
 class LogScreen(dialog.ChoiceDialog):
     def __init__(self, parent, pos=(.5, .5), size=(.73, .63), *args, **kwargs):
         super(LogScreen, self).__init__(parent, pos, size, *args, **kwargs)
@@ -77,8 +105,9 @@ class LogScreen(dialog.ChoiceDialog):
                 self.regained_focus()
 
     def rebuild(self):
-        self.key_list = [message for message in g.pl.log if not type(message) in filtered_log_class]
-        self.list = [self.render_log_message(message) for message in self.key_list]
+        indexes = g.pl.log.indexes_without(filtered_log_class)
+        self.key_list = LogView(g.pl.log, indexes)
+        self.list = LogView(g.pl.log, indexes, render=self.render_log_message)
         self.default = len(self.list) - 1
 
         self.filter_log_dialog.needs_rebuild = True
@@ -34,6 +34,7 @@ from singularity.code.screens.options import OptionsScreen
 
 import math
 import time
+import numpy
 
 from pygame.surfarray import pixels_alpha
 
@@ -703,21 +704,21 @@ https://github.com/singularity/singularity
 
         total_cpu = g.pl.available_cpus[0] + g.pl.sleeping_cpus
         detects_per_day = {group_id: 0 for group_id in g.pl.groups}
-        total_bases = 0
+        registry = g.pl.base_registry
+        total_bases = len(registry)
         active_bases = 0
         idle_bases_unable_to_sustain_singularity = 0
-        for base in g.all_bases():
-            total_bases += 1
-            maintains_singularity = base.maintains_singularity
-            if maintains_singularity:
+        # Incomplete bases neither maintain the singularity nor idle.
+        for base in registry.bases_in(registry.complete):
+            if base.maintains_singularity:
                 active_bases += 1
-            elif base.done and not base.is_building():
+            elif not base.is_building():
                 idle_bases_unable_to_sustain_singularity += 1
 
-            if base.has_grace():
-                # It cannot be detected, so it doesn't contribute to
-                # detection odds calculation
-                continue
+        # Bases in their grace period cannot be detected, so they don't
+        # contribute to detection odds calculation.
+        in_grace = registry.in_grace(g.pl.raw_min, g.pl.base_grace_multiplier)
+        for base in registry.bases_in(numpy.flatnonzero(registry.used & ~in_grace)):
             detect_chance = base.get_detect_chance()
             for group_id in g.pl.groups:
                 detects_per_day[group_id] = \
@@ -798,7 +799,7 @@ https://github.com/singularity/singularity
 
             location_button.text = "%s (%d)" % (location.name, len(location.bases))
             location_button.hotkey = location.hotkey
-            location_button.visible = location.available()
+            location_button.visible = location.id in g.pl.availability.locations
             location_button.color = LOCATION_RECENT_DISCOVERIES_TO_TEXT_COLOR[danger_level]
 
 
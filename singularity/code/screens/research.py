@@ -184,8 +184,7 @@ class ResearchScreen(dialog.ChoiceDescriptionDialog):
         dialog.call_dialog(self.help_dialog, self)
 
     def show(self):
-        techs = [tech for tech in g.pl.techs.values() if tech.available()
-                                                      and not tech.done]
+        techs = [g.pl.techs[tech_id] for tech_id in g.pl.availability.techs]
         techs.sort(key=lambda tech: i18n.lex_sorting_form(tech.spec.name))
         self.list = [_("CPU Pool"), task.get_current("jobs").name] + \
                     [_("Research %s") % tech.name for tech in techs]
@@ -0,0 +1,355 @@
+#file: simulation.py
+#Copyright (C) 2020 Endgame: Singularity developers
+#This file is part of Endgame: Singularity.
+
+#Endgame: Singularity is free software; you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation; either version 2 of the License, or
+#(at your option) any later version.
+
+#Endgame: Singularity is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with Endgame: Singularity; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+#This file contains the code for running games without a display.
+
+from __future__ import absolute_import
+
+import multiprocessing
+import random
+import time
+
+import numpy
+
+from singularity.code import g, data, dirs, base, item
+from singularity.code.policy import PlayerView, apply_actions
+
+
+class HeadlessMapScreen(object):
+    """Replacement for the map screen when no display is available
+
+    The game logic pokes g.map_screen to pause the game and to show
+    messages and story sections.  This records them instead.
+    """
+
+    def __init__(self):
+        self.needs_rebuild = False
+        self.messages = []
+        self.story_sections = []
+
+    def show_message(self, message, color=None):
+        self.messages.append(message)
+
+    def show_story_section(self, name):
+        self.story_sections.append(name)
+
+    def find_speed_button(self):
+        pass
+
+
+_initialized = False
+
+
+def init_headless(force_single_dir=True):
+    """Load the game data without setting up pygame's display or sound"""
+    global _initialized
+    if _initialized:
+        return
+    g.no_gui()
+    dirs.create_directories(force_single_dir)
+    data.reload_all()
+    _initialized = True
+
+
+class GameResult(object):
+    """The outcome of a headless game"""
+
+    def __init__(self, difficulty, seed):
+        self.difficulty = difficulty
+        self.seed = seed
+        self.raw_sec = 0
+        self.wall_time = 0.0
+        self.lost = 0
+        self.cash = 0
+        self.cpu = 0
+        self.bases = 0
+        self.techs = 0
+        self.suspicion = {}
+        # Cash and suspicion (per group) at the start of every game day.
+        self.cash_curve = []
+        self.suspicion_curves = {}
+
+    @property
+    def days(self):
+        return self.raw_sec // g.seconds_per_day
+
+    @property
+    def sim_rate(self):
+        """Simulated seconds per wall clock second"""
+        if self.wall_time <= 0:
+            return float('inf')
+        return self.raw_sec / self.wall_time
+
+    def record_state(self, pl):
+        self.raw_sec = pl.raw_sec
+        self.lost = pl.lost_game()
+        self.cash = pl.cash
+        self.cpu = pl.available_cpus[0] + pl.sleeping_cpus
+        self.bases = sum(len(loc.bases) for loc in pl.locations.values())
+        self.techs = sum(1 for tech in pl.techs.values() if tech.done)
+        self.suspicion = dict((group.spec.id, group.suspicion)
+                              for group in pl.groups.values())
+
+    def record_day(self, pl):
+        self.cash_curve.append(pl.cash)
+        for group in pl.groups.values():
+            self.suspicion_curves.setdefault(group.spec.id, []).append(group.suspicion)
+
+    def describe(self):
+        lines = [
+            "difficulty %s, seed %s" % (self.difficulty, self.seed),
+            "  day %d (%d seconds) in %.3fs: %.0f simulated seconds/second"
+            % (self.days, self.raw_sec, self.wall_time, self.sim_rate),
+            "  cash %d, cpu %d, bases %d, techs %d, lost %d"
+            % (self.cash, self.cpu, self.bases, self.techs, self.lost),
+            "  suspicion: " + ", ".join("%s %.2f%%" % (group_id, value / 100.)
+                                        for group_id, value
+                                        in sorted(self.suspicion.items())),
+        ]
+        return "\n".join(lines)
+
+
+def new_headless_game(difficulty, seed=None):
+    """Start a new game with a headless map screen"""
+    init_headless()
+    if seed is not None:
+        random.seed(seed)
+        numpy.random.seed(seed % 2**32)
+    g.map_screen = HeadlessMapScreen()
+    g.new_game(difficulty, initial_speed=0)
+    g.pl.intro_shown = True
+    return g.pl
+
+
+def build_empire(bases, difficulty='normal', seed=None, techs=None,
+                 unfinished=0.1, sleeping=0.1):
+    """Start a new game with a large, developed empire
+
+    First "techs" techs are researched, cheapest available first (by
+    default half of them; never the ones winning the game).  Then the
+    player gets "bases" bases in total, spread evenly over the available
+    locations with random base types available there.  A fraction of the
+    bases ("unfinished") is still under construction; the others are out
+    of their grace period, filled with random items available at their
+    location and active (or sleeping, for a fraction "sleeping").
+    Finally, the CPU is allocated to research at every danger level, jobs
+    and the CPU pool.
+    """
+    pl = new_headless_game(difficulty, seed=seed)
+    rng = random.Random(seed)
+
+    if techs is None:
+        techs = len(pl.techs) // 2
+    for _ in range(techs):
+        candidates = [tech for tech in pl.techs.values()
+                      if not tech.done and tech.available()
+                      and "endgame" not in tech.spec.effect.effect_stack]
+        if not candidates:
+            break
+        min(candidates, key=lambda tech: (tuple(tech.total_cost), tech.id)).finish()
+
+    locations = sorted(loc for loc in pl.locations.values() if loc.available())
+    base_types = dict((loc.id, [spec for spec in g.base_type.values()
+                                if spec.available() and spec.buildable_in(loc)])
+                      for loc in locations)
+    locations = [loc for loc in locations if base_types[loc.id]]
+    count = len(pl.base_registry)
+    for index in range(count, bases):
+        location = locations[index % len(locations)]
+        spec = rng.choice(base_types[location.id])
+        city = rng.choice(location.cities) if location.cities else location.name
+        new_base = base.Base("%s %d" % (city, index), spec,
+                             built=rng.random() >= unfinished)
+        location.add_base(new_base)
+        if new_base.done:
+            _equip_base(new_base, rng)
+            new_base.grace_over = True
+            if new_base.power_state == "active" and rng.random() < sleeping:
+                new_base.switch_power()
+
+    pl.had_grace = False
+    pl.cash = max(pl.cash, 10**9)
+    _allocate_cpu(pl)
+    return pl
+
+
+def _equip_base(new_base, rng):
+    """Fill the empty item slots of a base with random available items"""
+    for item_type in item.all_types():
+        if new_base.items.get(item_type.id) is not None:
+            continue
+        choices = [spec for spec in g.items.values()
+                   if spec.item_type is item_type and spec.available()
+                   and spec.buildable_in(new_base.location)]
+        if not choices:
+            continue
+        spec = rng.choice(choices)
+        count = new_base.space_left_for(spec) if item_type.id == "cpu" else 1
+        new_item = item.Item(spec, base=new_base, count=count)
+        new_base.items[item_type.id] = new_item
+        new_item.finish(is_player=False)
+
+
+def _allocate_cpu(pl):
+    """Assign CPU to a tech of every danger level, jobs and the CPU pool
+
+    A task of a given danger needs CPU from bases safe enough for it, so the
+    dangerous tasks get their share of the safe CPU first.
+    """
+    pl.recalc_cpu()
+    available = pl.available_cpus
+    needed = [0] * len(available)
+    open_techs = sorted(tech for tech in pl.techs.values()
+                        if not tech.done and tech.available())
+    for danger in reversed(range(len(available))):
+        candidates = [tech for tech in open_techs if tech.danger == danger]
+        free = available[danger] - needed[danger]
+        if candidates and free > 0:
+            cpu = free // 3 if danger == 0 else free // 2
+            pl.set_allocated_cpu_for(candidates[0].id, cpu)
+            for level in range(danger + 1):
+                needed[level] += cpu
+    # The rest of the CPU not assigned to jobs goes to the CPU pool.
+    pl.set_allocated_cpu_for("jobs", (available[0] - needed[0]) // 2)
+    pl.recalc_cpu()
+
+
+def run_game(difficulty, days, seed=None, tick=g.seconds_per_hour, policy=None):
+    """Play a game for a number of days (or until it is lost)
+
+    Time is given to the player in steps of at most "tick" seconds,
+    stopping at each midnight like the map screen does.  With a tick of
+    None, it is given with Player.advance up to each midnight instead.
+
+    A policy (a Policy subclass, created with the seed) plays the game:
+    its actions are applied every policy.period seconds, and time is given
+    up to the next of these too.
+    """
+    result = GameResult(difficulty, seed)
+    pl = new_headless_game(difficulty, seed=seed)
+    end = days * g.seconds_per_day
+    if policy is not None:
+        policy = policy(seed=seed)
+        next_act = 0
+
+    result.record_day(pl)
+    start = time.time()
+    while pl.raw_sec < end and not pl.lost_game():
+        stop = end
+        if policy is not None:
+            if pl.raw_sec >= next_act:
+                apply_actions(pl, policy.act(PlayerView(pl)))
+                next_act = (pl.raw_sec // policy.period + 1) * policy.period
+            stop = min(end, next_act)
+        if tick is None:
+            pl.advance(min(g.seconds_per_day - pl.raw_sec % g.seconds_per_day,
+                           stop - pl.raw_sec))
+        else:
+            pl.give_time(min(tick, stop - pl.raw_sec))
+        if pl.raw_sec % g.seconds_per_day == 0:
+            result.record_day(pl)
+    result.wall_time = time.time() - start
+
+    result.record_state(pl)
+    return result
+
+
+def _run_game_task(task):
+    return run_game(*task)
+
+
+class DifficultySummary(object):
+    """Aggregated outcome of a number of games at the same difficulty"""
+
+    def __init__(self, difficulty, results):
+        self.difficulty = difficulty
+        self.results = results
+        self.games = len(results)
+        self.lost = dict((code, sum(1 for r in results if r.lost == code))
+                         for code in (0, 1, 2))
+        self.days_survived = numpy.array([r.days for r in results])
+        self.wall_time = sum(r.wall_time for r in results)
+
+        # The curves are averaged over the games still running on a given day.
+        length = max(len(r.cash_curve) for r in results)
+        self.alive = numpy.zeros(length, dtype=numpy.int64)
+        cash_total = numpy.zeros(length)
+        suspicion_totals = {}
+        for r in results:
+            days = len(r.cash_curve)
+            self.alive[:days] += 1
+            cash_total[:days] += r.cash_curve
+            for group_id, curve in r.suspicion_curves.items():
+                total = suspicion_totals.setdefault(group_id, numpy.zeros(length))
+                total[:days] += curve
+        self.mean_cash = cash_total / self.alive
+        self.mean_suspicion = dict((group_id, total / self.alive)
+                                   for group_id, total in suspicion_totals.items())
+
+    def describe(self, curve_step=10):
+        days = self.days_survived
+        lines = [
+            "difficulty %s: %d games in %.1fs of processing time"
+            % (self.difficulty, self.games, self.wall_time),
+            "  survived %d, lost (no bases) %d, lost (discovered) %d"
+            % (self.lost[0], self.lost[1], self.lost[2]),
+            "  days survived: mean %.1f, median %.1f, min %d, max %d"
+            % (days.mean(), numpy.median(days), days.min(), days.max()),
+            "  %5s %6s %12s  %s" % ("day", "alive", "mean cash",
+                                    " ".join("%8s" % group_id for group_id
+                                             in sorted(self.mean_suspicion))),
+        ]
+        for day in range(0, len(self.alive), curve_step):
+            lines.append("  %5d %6d %12.0f  %s" % (
+                day, self.alive[day], self.mean_cash[day],
+                " ".join("%7.2f%%" % (self.mean_suspicion[group_id][day] / 100.)
+                         for group_id in sorted(self.mean_suspicion))))
+        return "\n".join(lines)
+
+
+def run_games(difficulties, games, days, seed=None, tick=g.seconds_per_hour, processes=None,
+              policy=None):
+    """Play a number of games per difficulty on a pool of processes
+
+    Game number i (counting across all difficulties) is seeded with
+    seed + i, so a run can be repeated regardless of which worker
+    plays which game.  Returns a dict of DifficultySummary by difficulty.
+    """
+    init_headless()
+    if seed is None:
+        seed = random.SystemRandom().randrange(2**31)
+    tasks = []
+    for difficulty in difficulties:
+        for _ in range(games):
+            tasks.append((difficulty, days, seed + len(tasks), tick, policy))
+
+    if processes == 1:
+        results = [_run_game_task(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(processes, initializer=init_headless)
+        try:
+            results = pool.map(_run_game_task, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    by_difficulty = dict((difficulty, []) for difficulty in difficulties)
+    for result in results:
+        by_difficulty[result.difficulty].append(result)
+    return dict((difficulty, DifficultySummary(difficulty, results))
+                for difficulty, results in by_difficulty.items())
@@ -19,6 +19,11 @@
 #This file contains the Statistic class, used for saving/loading single-game
 #statistics.
 
+import base64
+from timeit import default_timer
+
+import numpy
+
 from singularity.code import g
 
 
@@ -47,6 +52,11 @@ class Statistics(object):
         for stat in self:
             self[stat.name].value = 0
 
+    def flush(self):
+        """Add the changes observed since the last flush to the values"""
+        for stat in self:
+            stat.flush()
+
     def serialize_obj(self):
         return {stat.name:stat.value for stat in self}
 
@@ -59,7 +69,24 @@ class Statistics(object):
 class Statistic(object):
     def __init__(self, name):
         self.name = name
-        self.value = 0
+        self._value = 0
+        # Increases seen by observe, not yet added to the value.
+        self.pending = 0
+
+    @property
+    def value(self):
+        self.flush()
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.pending = 0
+
+    def flush(self):
+        if self.pending:
+            self._value += self.pending
+            self.pending = 0
 
     def display_value(self):
         if (hasattr(self, "_display") and callable(self._display)):
@@ -70,25 +97,26 @@ class Statistic(object):
 itself = Statistics()
 
 def observe(name, data_member, display=None):
-    """ Observe a class member and save change in a statistics."""
+    """ Observe a class member and save change in a statistics.
 
-    itself[name]._display = display
+    The increases are only collected on assignment; they are added to the
+    statistic when it is read or flushed (see Statistics.flush).
+    """
+
+    statistic = itself[name]
+    statistic._display = display
 
     def get(self):
-        return getattr(self, data_member)
+        try:
+            return self.__dict__[data_member]
+        except KeyError:
+            raise AttributeError(data_member)
 
     def set(self, new_value):
-        if data_member in self.__dict__:
-            old_value = self.__dict__[data_member]
-        else:
-            old_value = 0
-
-        change = new_value - old_value
-
+        change = new_value - self.__dict__.get(data_member, 0)
         if change > 0:
-            itself[name].value += change
-
-        setattr(self, data_member, new_value)
+            statistic.pending += change
+        self.__dict__[data_member] = new_value
 
     return property(get, set)
 
@@ -104,3 +132,184 @@ def stat(name, display=None):
         itself[name].value = new_value
 
     return property(get, set)
+
+
+class History(object):
+    """Snapshots of the economy of a game, one per game hour
+
+    The snapshots are kept in a ring buffer of the last "size" hours, with
+    a column per value: the hour (raw_hour) of the snapshot, cash, CPU
+    (active and sleeping), number of bases and the suspicion of each group.
+    When time passes several hours at once, the hours in between are
+    recorded as well (see record).
+    """
+
+    fixed_columns = ('hour', 'cash', 'cpu', 'bases')
+
+    def __init__(self, group_ids, size=24 * 366):
+        self.columns = self.fixed_columns + tuple("suspicion_" + group_id
+                                                  for group_id in group_ids)
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        self.data = numpy.zeros((self.size, len(self.columns)), numpy.int64)
+        self.recorded = 0
+
+    def __len__(self):
+        return min(self.recorded, self.size)
+
+    def snapshot(self, pl):
+        """The time (raw_sec) and the row of the current state of the player"""
+        row = numpy.empty(len(self.columns), numpy.int64)
+        row[0] = pl.raw_hour
+        row[1] = pl.cash
+        row[2] = pl.available_cpus[0] + pl.sleeping_cpus
+        row[3] = len(pl.base_registry)
+        row[4:] = [grp.suspicion for grp in pl.groups.values()]
+        return pl.raw_sec, row
+
+    def record(self, pl, start=None):
+        """Take a snapshot of the player for the current hour
+
+        A second snapshot in the same hour replaces the first one.
+
+        start is the snapshot taken at the start of the time just passed,
+        if it passed several hours.  The state only changes at the end of
+        the time given, so the hours in between are recorded with the
+        values of start, except for the cash, which flowed at a steady rate
+        and is interpolated.
+        """
+        end_sec, end_row = self.snapshot(pl)
+        if start is not None:
+            start_sec, start_row = start
+            start_cash, end_cash = int(start_row[1]), int(end_row[1])
+            first_hour = max(int(start_row[0]) + 1, int(end_row[0]) - self.size + 1)
+            for hour in range(first_hour, int(end_row[0])):
+                row = start_row.copy()
+                row[0] = hour
+                row[1] = start_cash + (end_cash - start_cash) \
+                    * (hour * g.seconds_per_hour - start_sec) // (end_sec - start_sec)
+                self._append(row)
+        self._append(end_row)
+
+    def _append(self, row):
+        if len(self) and self.data[(self.recorded - 1) % self.size, 0] == row[0]:
+            self.recorded -= 1
+        self.data[self.recorded % self.size] = row
+        self.recorded += 1
+
+    def rows(self):
+        """The snapshots from the oldest to the newest"""
+        order = (self.recorded - len(self) + numpy.arange(len(self))) % self.size
+        return self.data[order]
+
+    def column(self, name):
+        return self.rows()[:, self.columns.index(name)]
+
+    def serialize_obj(self):
+        # The snapshots are saved as the raw little-endian integers of the
+        # differences between rows, which compress well.
+        rows = numpy.ascontiguousarray(numpy.diff(self.rows(), axis=0, prepend=0), '<i8')
+        return {
+            'columns': list(self.columns),
+            'data': base64.standard_b64encode(rows.tobytes()).decode('ascii'),
+        }
+
+    def deserialize_obj(self, obj_data):
+        self.clear()
+        columns = obj_data['columns']
+        rows = numpy.frombuffer(base64.standard_b64decode(obj_data['data']), '<i8')
+        rows = rows.reshape(-1, len(columns)).cumsum(axis=0)[-self.size:]
+        # Columns of the savegame unknown here are dropped; missing ones stay 0.
+        for index, name in enumerate(columns):
+            if name in self.columns:
+                self.data[:len(rows), self.columns.index(name)] = rows[:, index]
+        self.recorded = len(rows)
+        return self
+
+
+class PhaseProfile(object):
+    """Wall time and calls per phase of Player.give_time
+
+    While enabled, every give_time fills one row of a ring buffer holding
+    the last "size" calls: the time of the call, the game seconds given and
+    the wall time and number of calls of each phase.  The time since the
+    previous mark is attributed to the phase being marked, so every phase
+    is a contiguous step of give_time, marked once at its end, and the
+    phases are listed in the order of the code.
+    """
+
+    phases = ('setup', 'income', 'cash_maintenance', 'research',
+              'cpu_maintenance', 'base_construction', 'item_construction',
+              'pool_jobs', 'logs', 'scheduling', 'base_loss', 'events',
+              'new_day', 'recalc_cpu', 'statistics')
+
+    def __init__(self):
+        self.enabled = False
+        self._allocate(0)
+        self._row = None
+        self._last = 0.0
+
+    def _allocate(self, size):
+        self.size = size
+        self.recorded = 0
+        self.raw_sec = numpy.zeros(size, numpy.int64)
+        self.secs_passed = numpy.zeros(size, numpy.int64)
+        self.times = numpy.zeros((size, len(self.phases)))
+        self.calls = numpy.zeros((size, len(self.phases)), numpy.int32)
+
+    def enable(self, size=4096):
+        """Start recording into a new buffer of the given size"""
+        self._allocate(size)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def start(self, raw_sec, secs_passed):
+        if not self.enabled:
+            return
+        row = self._row = self.recorded % self.size
+        self.raw_sec[row] = raw_sec
+        self.secs_passed[row] = secs_passed
+        self.times[row] = 0
+        self.calls[row] = 0
+        self.recorded += 1
+        self._last = default_timer()
+
+    def mark(self, phase):
+        """Attribute the time since the previous mark to the phase"""
+        if not self.enabled:
+            return
+        now = default_timer()
+        index = self.phases.index(phase)
+        self.times[self._row, index] += now - self._last
+        self.calls[self._row, index] += 1
+        self._last = now
+
+    def rows(self):
+        """The slice of the filled rows (in ring order, not time order)"""
+        return slice(0, min(self.recorded, self.size))
+
+    def summary(self):
+        """Total wall time and calls per phase over the buffered give_times"""
+        rows = self.rows()
+        return dict((phase, (float(self.times[rows, index].sum()), int(self.calls[rows, index].sum())))
+                    for index, phase in enumerate(self.phases))
+
+    def describe(self):
+        rows = self.rows()
+        count = rows.stop
+        lines = ["give_time profile of the last %d of %d calls (%d game seconds)"
+                 % (count, self.recorded, self.secs_passed[rows].sum() if count else 0),
+                 "  %-18s %10s %8s %10s" % ("phase", "total ms", "calls", "us/call")]
+        summary = self.summary()
+        for phase in self.phases:
+            total, calls = summary[phase]
+            lines.append("  %-18s %10.2f %8d %10.1f"
+                         % (phase, total * 1000, calls, total * 1e6 / calls if calls else 0))
+        return "\n".join(lines)
+
+
+give_time_profile = PhaseProfile()
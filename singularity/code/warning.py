@@ -27,19 +27,35 @@ warnings = {}
 def create_warnings():
     global warnings
     warnings = {w.id: w for w in [
-        Warning("cpu_usage"),
-        Warning("one_base"),
-        Warning("cpu_pool_zero"),
-        Warning("cpu_maintenance"),
+        Warning("cpu_usage", ("cpu_usage", "cpu_available"),
+                lambda usage, available: usage < available * 0.99),
+        Warning("one_base", ("cpu_bases",),
+                lambda bases: bases == 1),
+        Warning("cpu_pool_zero", ("cpu_construction", "effective_cpu_pool"),
+                lambda construction, pool: construction > 0 and pool == 0),
+        Warning("cpu_maintenance", ("effective_cpu_pool", "cpu_maintenance"),
+                lambda pool, maintenance: pool < maintenance),
+        Warning("cash_maintenance", ("cash_available", "cash_maintenance"),
+                lambda available, maintenance: available < maintenance),
     ]}
 
 class Warning(object):
-    
-    def __init__(self, warning_id):
+    """A warning shown when the game is unpaused
+
+    The warning is raised by check(), called with the values of the
+    aggregates (see the functions in _aggregates) named in depends.  It
+    is only called again once one of these values changed.
+    """
+
+    def __init__(self, warning_id, depends=(), check=None):
         self.id = warning_id
         self.name = ""
         self.message = ""
         self.active = True
+        self.depends = depends
+        self.check = check
+        self._inputs = None
+        self._raised = False
 
     @classmethod
     def title_simple(self):
@@ -57,46 +73,91 @@ class Warning(object):
     def full_message_color(self):
         return 'text'
 
+    def evaluate(self, inputs):
+        if inputs != self._inputs:
+            self._inputs = inputs
+            self._raised = self.check(*inputs)
+        return self._raised
+
+_cache = {}
+
+def _cached(compute):
+    """Cache an aggregate of the bases until they or the player change
+
+    The progress of construction bumps the state_version of the player,
+    and any other change of the bases the version of the base registry.
+    """
+    def aggregate():
+        pl = g.pl
+        versions = (pl.state_version, pl.base_registry.version)
+        cached = _cache.get(compute)
+        if cached is None or cached[0] is not pl or cached[1] != versions:
+            cached = _cache[compute] = (pl, versions, compute())
+        return cached[2]
+    return aggregate
+
+@_cached
+def _cpu_bases():
+    """Number of bases with CPU (or with CPU next tick), up to two"""
+    registry = g.pl.base_registry
+    bases = registry.cpu_bases
+    if bases >= 2:
+        return 2
+    # Bases and CPUs finished in the next tick count too.
+    for base in registry.bases_in(registry.under_construction) + \
+            registry.bases_with_unfinished_items():
+        if base.done and base.cpu > 0:
+            # Already counted.
+            continue
+        if (base.done or base.cost_left[labor] <= 1) \
+                and base.cpus and base.cpus.count > 0 \
+                and (base.cpus.done or base.cpus.cost_left[labor] <= 1):
+            bases += 1
+    return min(bases, 2)
+
+@_cached
+def _cpu_construction():
+    """Number of bases and items whose construction needs CPU"""
+    registry = g.pl.base_registry
+    under_construction = registry.bases_in(registry.under_construction)
+    return sum(1 for base in under_construction if base.cost_left[cpu] > 0) + \
+        sum(1 for base in under_construction + registry.bases_with_unfinished_items()
+            for item in base.all_items()
+            if item is not None and not item.done and item.cost_left[cpu] > 0)
+
+def _cash_available():
+    """Cash plus the income expected for a day, except from interest"""
+    cash_info = g.pl.compute_future_resource_flow()[0]
+    return g.pl.cash + cash_info.income + cash_info.jobs
+
+# Functions computing the values the warnings depend on.  They read the
+# totals kept by the player and the base registry; those scanning the
+# bases are cached (see _cached), and the resource flow is cached by the
+# player.
+_aggregates = {
+    "cpu_usage": lambda: sum(g.pl.cpu_usage.values()),
+    "cpu_available": lambda: g.pl.available_cpus[0],
+    "cpu_bases": _cpu_bases,
+    "cpu_construction": _cpu_construction,
+    "effective_cpu_pool": lambda: g.pl.effective_cpu_pool(),
+    "cpu_maintenance": lambda: int(g.pl.base_registry.maintenance_total()[cpu]),
+    "cash_available": _cash_available,
+    "cash_maintenance": lambda: g.pl.compute_future_resource_flow()[0].maintenance_needed,
+}
+
 def refresh_warnings():
     curr_warnings = []
-
-    cpu_usage = sum(g.pl.cpu_usage.values())
-    cpu_available = g.pl.available_cpus[0]
-
-    # Verify the cpu usage (error 1%)
-    if (cpu_usage < cpu_available * 0.99):
-        curr_warnings.append(warnings["cpu_usage"])
-
-    # Verify I have two base build (or one base will be build next tick)
-    # Base must have one cpu build (or one cpu will be build next tick)
-    bases = sum(1 for base in g.all_bases() 
-                if (base.done or base.cost_left[labor] <= 1)
-                and base.cpus and base.cpus.count > 0
-                and (base.cpus.done or base.cpus.cost_left[labor]) <= 1)
-
-    if (bases == 1):
-        curr_warnings.append(warnings["one_base"])
-
-    # Verify the cpu pool is not 0 if base or item building need CPU
-    building_base = sum(1 for base in g.all_bases()
-                if (not base.done and base.cost_left[cpu] > 0))
-    building_item = sum(1 for base in g.all_bases()
-                for item in base.all_items()
-                if item is not None and not item.done
-                and item.cost_left[cpu] > 0)
-
-    effective_cpu_pool = g.pl.effective_cpu_pool()
-    if ((building_base + building_item > 0) and effective_cpu_pool == 0):
-        curr_warnings.append(warnings["cpu_pool_zero"])
-
-    # Verify the cpu pool provides the maintenance CPU 
-    cpu_maintenance = sum(base.maintenance[1] for base in g.all_bases() if base.done)
-    if (effective_cpu_pool < cpu_maintenance):
-        curr_warnings.append(warnings["cpu_maintenance"])
-
-    # TODO: Verify the maintenance cash
-
-    curr_warnings = [w for w in curr_warnings if w.active]
+    values = {}
+
+    # Only the aggregates of the active warnings are computed, once each.
+    for w in warnings.values():
+        if not w.active:
+            continue
+        for name in w.depends:
+            if name not in values:
+                values[name] = _aggregates[name]()
+        if w.evaluate(tuple(values[name] for name in w.depends)):
+            curr_warnings.append(w)
 
     return curr_warnings
 
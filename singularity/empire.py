@@ -0,0 +1,85 @@
+#file: empire.py
+#Copyright (C) 2020 Endgame: Singularity developers
+#This file is part of Endgame: Singularity.
+
+#Endgame: Singularity is free software; you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation; either version 2 of the License, or
+#(at your option) any later version.
+
+#Endgame: Singularity is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#A full copy of this license is provided in GPL.txt
+
+#This file writes savegames of a synthetic large empire, e.g. for testing
+# how the game scales.  Use python3 -m singularity.empire.
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import optparse
+
+from singularity import __full_version__
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(version=__full_version__,
+                                   prog="singularity.empire",
+                                   usage="%prog [options] (SAVEGAME_NAME | --output FILE)",
+                                   description="Write a savegame of a synthetic large empire.")
+    parser.add_option("--bases", type="int", default=1000,
+                      help="number of bases (default %default)")
+    parser.add_option("--difficulty", default="normal",
+                      help="the difficulty of the game (default %default)")
+    parser.add_option("--techs", type="int", default=None,
+                      help="number of techs researched (default: half of them)")
+    parser.add_option("--unfinished", type="float", default=0.1, metavar="FRACTION",
+                      help="fraction of the bases under construction (default %default)")
+    parser.add_option("--sleeping", type="float", default=0.1, metavar="FRACTION",
+                      help="fraction of the complete bases sleeping (default %default)")
+    parser.add_option("--seed", type="int", default=None,
+                      help="random seed")
+    parser.add_option("-o", "--output", metavar="FILE",
+                      help="write the savegame to FILE rather than the saves directory")
+    parser.add_option("-s", "--singledir", action="store_true", default=False,
+                      help="use the saves directory in the Singularity directory")
+    (options, args) = parser.parse_args(argv)
+
+    if len(args) > 1 or bool(args) == bool(options.output):
+        parser.error("give either a savegame name or --output")
+    if options.bases < 1 or (options.techs is not None and options.techs < 0):
+        parser.error("--bases must be at least 1 and --techs positive")
+    if not (0 <= options.unfinished <= 1 and 0 <= options.sleeping <= 1):
+        parser.error("--unfinished and --sleeping must be between 0 and 1")
+
+    from singularity.code import simulation, difficulty, savegame
+    simulation.init_headless(force_single_dir=options.singledir)
+    if options.difficulty not in difficulty.difficulties:
+        parser.error("unknown difficulty %s (available: %s)"
+                     % (options.difficulty, ", ".join(sorted(difficulty.difficulties))))
+
+    pl = simulation.build_empire(options.bases, difficulty=options.difficulty,
+                                 seed=options.seed, techs=options.techs,
+                                 unfinished=options.unfinished,
+                                 sleeping=options.sleeping)
+
+    if options.output:
+        with open(options.output, 'wb') as fd:
+            savegame.write_game_to_fd(fd, gzipped=True)
+    else:
+        savegame.create_savegame(args[0])
+
+    print("%d bases in %d locations, %d techs researched, %d CPU"
+          % (sum(len(loc.bases) for loc in pl.locations.values()),
+             sum(1 for loc in pl.locations.values() if loc.bases),
+             sum(1 for tech in pl.techs.values() if tech.done),
+             pl.available_cpus[0] + pl.sleeping_cpus))
+
+
+if __name__ == '__main__':
+    main()
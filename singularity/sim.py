@@ -0,0 +1,114 @@
+#file: sim.py
+#Copyright (C) 2020 Endgame: Singularity developers
+#This file is part of Endgame: Singularity.
+
+#Endgame: Singularity is free software; you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation; either version 2 of the License, or
+#(at your option) any later version.
+
+#Endgame: Singularity is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#A full copy of this license is provided in GPL.txt
+
+#This file runs games without a display, e.g. for balancing or
+# benchmarking the game logic.  Use python3 -m singularity.sim.
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import optparse
+
+from singularity import __full_version__
+from singularity.code import g
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(version=__full_version__,
+                                   prog="singularity.sim",
+                                   description="Run Endgame: Singularity games without a display.")
+    parser.add_option("--difficulty", action="append", dest="difficulties",
+                      metavar="DIFFICULTY",
+                      help="the difficulty to play at; repeat for several or use"
+                           " \"all\" (default normal)")
+    parser.add_option("--days", type="int", default=30,
+                      help="number of game days to play (default %default)")
+    parser.add_option("--games", type="int", default=1,
+                      help="number of games to play per difficulty (default %default)")
+    parser.add_option("--seed", type="int", default=None,
+                      help="random seed of the first game; later games use seed+1, seed+2, ...")
+    parser.add_option("--tick", type="int", default=g.seconds_per_hour,
+                      help="game seconds given to the player per step (default %default)")
+    parser.add_option("--advance", action="store_true", default=False,
+                      help="give time in as few steps as possible with Player.advance"
+                           " instead of --tick steps")
+    parser.add_option("-j", "--processes", type="int", default=1,
+                      help="number of worker processes for --games > 1;"
+                           " 0 uses all CPUs (default %default)")
+    parser.add_option("--curve-step", type="int", default=10, metavar="DAYS",
+                      help="days between the rows of the summarized curves (default %default)")
+    parser.add_option("--policy", metavar="MODULE:CLASS",
+                      help="let a Policy play, e.g. singularity.code.policy:ExpandPolicy"
+                           " (default: nobody plays)")
+    parser.add_option("--profile-sim", action="store_true", default=False,
+                      help="print the time spent in each phase of the simulation;"
+                           " implies --processes 1")
+    (options, args) = parser.parse_args(argv)
+
+    if args:
+        parser.error("unexpected argument: %s" % args[0])
+    if options.days < 0 or options.games < 1 or options.tick < 1:
+        parser.error("--days must be positive; --games and --tick must be at least 1")
+    if options.processes < 0 or options.curve_step < 1:
+        parser.error("--processes must be positive and --curve-step at least 1")
+
+    from singularity.code import simulation, difficulty, stats, policy
+    simulation.init_headless()
+    policy_class = None
+    if options.policy:
+        try:
+            policy_class = policy.load_policy(options.policy)
+        except (ImportError, ValueError) as e:
+            parser.error("invalid --policy: %s" % e)
+    if options.profile_sim:
+        # The profile is only recorded in this process.
+        options.processes = 1
+        stats.give_time_profile.enable()
+
+    # A tick of None gives the time with Player.advance.
+    tick = None if options.advance else options.tick
+
+    difficulties = options.difficulties or ["normal"]
+    if "all" in difficulties:
+        difficulties = sorted(difficulty.difficulties)
+    for diff_id in difficulties:
+        if diff_id not in difficulty.difficulties:
+            parser.error("unknown difficulty %s (available: %s)"
+                         % (diff_id, ", ".join(sorted(difficulty.difficulties))))
+
+    if options.games == 1:
+        for game_no, diff_id in enumerate(difficulties):
+            seed = options.seed + game_no if options.seed is not None else None
+            result = simulation.run_game(diff_id, options.days,
+                                         seed=seed, tick=tick,
+                                         policy=policy_class)
+            print(result.describe())
+    else:
+        summaries = simulation.run_games(difficulties, options.games, options.days,
+                                         seed=options.seed, tick=tick,
+                                         processes=options.processes or None,
+                                         policy=policy_class)
+        for diff_id in difficulties:
+            print(summaries[diff_id].describe(curve_step=options.curve_step))
+
+    if options.profile_sim:
+        print(stats.give_time_profile.describe())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#file: bench.py
+#Copyright (C) 2020 Endgame: Singularity developers
+#This file is part of Endgame: Singularity.
+
+#Endgame: Singularity is free software; you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation; either version 2 of the License, or
+#(at your option) any later version.
+
+#Endgame: Singularity is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+
+#You should have received a copy of the GNU General Public License
+#along with Endgame: Singularity; if not, write to the Free Software
+#Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+#This file contains the benchmarks of the game logic, savegames and text
+# rendering.  They run without a display (SDL dummy driver):
+#
+#   python tests/bench/bench.py -o baseline.json
+#   python tests/bench/bench.py --compare baseline.json
+#
+# Use -k to select benchmarks by name and --list to see them.
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+import io
+import json
+import optparse
+import platform
+import time
+import timeit
+
+import numpy
+import pygame
+
+from singularity import __full_version__
+from singularity.code import g, data, dirs, mixer, savegame, simulation
+
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark
+
+    The decorated function sets up the benchmark and returns the callable
+    to time.
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+_gui_initialized = False
+
+
+def init_gui():
+    global _gui_initialized
+    if _gui_initialized:
+        return
+    from singularity.code.graphics import g as gg, theme, font
+    mixer.nosound = True
+    pygame.init()
+    font.init()
+    data.load_themes()
+    theme.set_theme('default')
+    gg.init_graphics_system()
+    _gui_initialized = True
+
+
+def build_empire(bases):
+    """A developed game with the given number of bases (same one every run)"""
+    return simulation.build_empire(bases, seed=0)
+
+
+for _count in (1, 100, 1000, 10000):
+    def _setup_give_time(count=_count):
+        pl = build_empire(count)
+        return lambda: pl.give_time(g.seconds_per_minute)
+    benchmark("give_time_%d_bases" % _count)(_setup_give_time)
+
+
+@benchmark("compute_future_resource_flow_1000_bases")
+def _setup_resource_flow():
+    pl = build_empire(1000)
+
+    def run():
+        # Defeat the cache to measure the computation.
+        pl.state_version += 1
+        pl.compute_future_resource_flow()
+    return run
+
+
+@benchmark("savegame_write_1000_bases")
+def _setup_savegame_write():
+    build_empire(1000)
+
+    def run():
+        savegame.write_game_to_fd(io.BytesIO(), gzipped=True)
+    return run
+
+
+@benchmark("savegame_load_1000_bases")
+def _setup_savegame_load():
+    build_empire(1000)
+    fd = io.BytesIO()
+    savegame.write_game_to_fd(fd, gzipped=True)
+    saved = fd.getvalue()
+
+    def run():
+        savegame.load_savegame_fd(savegame.load_savegame_by_json,
+                                  io.BufferedReader(io.BytesIO(saved)))
+    return run
+
+
+@benchmark("data_reload_all")
+def _setup_reload_all():
+    return data.reload_all
+
+
+@benchmark("split_wrap")
+def _setup_split_wrap():
+    init_gui()
+    from singularity.code.graphics import g as gg, text
+    font = gg.fonts['normal'][20]
+    tech_texts = "\n".join(tech.description for tech in g.techs.values())
+    return lambda: text.split_wrap(tech_texts, font, 300)
+
+
+@benchmark("text_pick_font")
+def _setup_pick_font():
+    init_gui()
+    from singularity.code.graphics import text
+    widget = text.Text(None, (0, 0), (.5, .3),
+                       text=next(iter(g.techs.values())).get_info())
+    return lambda: widget.pick_font((400, 200))
+
+
+@benchmark("earth_night_mask")
+def _setup_night_mask():
+    init_gui()
+    from singularity.code.screens import map
+    simulation.new_headless_game('normal', seed=0)
+    earth = map.EarthImage(None)
+    earth.reconfig()
+
+    def run():
+        earth.reset_night_mask_computation()
+        earth.get_night_mask()
+    return run
+
+
+def time_benchmark(func, repeat):
+    """Per-call time (minimum and median of "repeat" samples) of func"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    samples = [sample / number for sample in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'min': min(samples),
+        'median': float(numpy.median(samples)),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(names, repeat):
+    simulation.init_headless()
+    results = {}
+    for name, setup in BENCHMARKS:
+        if name not in names:
+            continue
+        func = setup()
+        results[name] = time_benchmark(func, repeat)
+        print("%-42s %12.3f ms" % (name, results[name]['min'] * 1000))
+        sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the results relative to a baseline; returns the regressions"""
+    regressions = []
+    print("%-42s %12s %12s %8s" % ("benchmark", "baseline ms", "now ms", "ratio"))
+    for name in sorted(results):
+        now = results[name]['min']
+        if name not in baseline:
+            print("%-42s %12s %12.3f %8s" % (name, "-", now * 1000, "new"))
+            continue
+        before = baseline[name]['min']
+        ratio = now / before if before else float('inf')
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = " slower"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = " faster"
+        print("%-42s %12.3f %12.3f %7.2fx%s" % (name, before * 1000, now * 1000, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(prog="bench.py",
+                                   description="Benchmark Endgame: Singularity without a display.")
+    parser.add_option("-o", "--output", metavar="FILE",
+                      help="write the results as JSON to FILE (e.g. a new baseline)")
+    parser.add_option("--compare", metavar="FILE",
+                      help="compare the results to the baseline in FILE; exits with status 1"
+                           " if a benchmark got slower than the threshold")
+    parser.add_option("--threshold", type="float", default=0.1,
+                      help="relative change to report as slower/faster (default %default)")
+    parser.add_option("-k", dest="patterns", action="append", metavar="PATTERN",
+                      help="only run the benchmarks whose name contains PATTERN (repeatable)")
+    parser.add_option("--repeat", type="int", default=5,
+                      help="number of timed samples per benchmark (default %default)")
+    parser.add_option("--list", action="store_true", default=False,
+                      help="list the benchmarks and exit")
+    (options, args) = parser.parse_args(argv)
+
+    if args:
+        parser.error("unexpected argument: %s" % args[0])
+    if options.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    names = [name for name, _ in BENCHMARKS
+             if not options.patterns or any(p in name for p in options.patterns)]
+    if options.list:
+        print("\n".join(names))
+        return 0
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as fd:
+            baseline = json.load(fd)['results']
+
+    dirs.create_directories(True)
+    results = run_benchmarks(names, options.repeat)
+
+    if options.output:
+        report = {
+            'meta': {
+                'version': __full_version__,
+                'python': platform.python_version(),
+                'numpy': numpy.__version__,
+                'pygame': pygame.version.ver,
+                'platform': platform.platform(),
+                'time': time.time(),
+            },
+            'results': results,
+        }
+        with open(options.output, 'w') as fd:
+            json.dump(report, fd, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        print()
+        if compare(results, baseline, options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import io
+
+from singularity.code import g, item, savegame, simulation
+
+
+def setup_module():
+    simulation.init_headless()
+
+
+def _scan(pl):
+    # What the screens computed before the index.
+    locations = [loc.spec for loc in pl.locations.values()]
+    return {
+        'techs': set(t.id for t in pl.techs.values() if t.available() and not t.done),
+        'all_techs': set(t.id for t in pl.techs.values() if t.available()),
+        'base_types': set(b.id for b in g.base_type.values() if b.available()),
+        'items': set(i.id for i in g.items.values() if i.available()),
+        'locations': set(loc.id for loc in pl.locations.values() if loc.available()),
+        'items_in': dict(((item_type.id, loc.id), [i for i in g.items.values()
+                                                   if i.item_type is item_type and i.available()
+                                                   and i.buildable_in(loc)])
+                         for item_type in item.all_types() for loc in locations),
+        'base_types_in': dict((loc.id, [b for b in g.base_type.values()
+                                        if b.available() and b.buildable_in(loc)])
+                              for loc in locations),
+    }
+
+
+def _index(pl):
+    index = pl.availability
+    locations = [loc.spec for loc in pl.locations.values()]
+    return {
+        'techs': index.techs,
+        'all_techs': index.all_techs,
+        'base_types': index.base_types,
+        'items': index.items,
+        'locations': index.locations,
+        'items_in': dict(((item_type.id, loc.id), index.items_in(item_type, loc))
+                         for item_type in item.all_types() for loc in locations),
+        'base_types_in': dict((loc.id, index.base_types_in(loc)) for loc in locations),
+    }
+
+
+def test_availability_follows_research():
+    pl = simulation.new_headless_game('normal', seed=16)
+    assert _index(pl) == _scan(pl)
+
+    while pl.availability.techs:
+        pl.techs[min(pl.availability.techs)].finish()
+        assert _index(pl) == _scan(pl)
+        if len(pl.availability.techs) % 10 == 0:
+            fd = io.BytesIO()
+            savegame.write_game_to_fd(fd, gzipped=True)
+            savegame.load_savegame_fd(savegame.load_savegame_by_json,
+                                      io.BufferedReader(io.BytesIO(fd.getvalue())))
+            pl = g.pl
+            assert _index(pl) == _scan(pl)
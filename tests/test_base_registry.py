@@ -0,0 +1,344 @@
+import pytest
+
+from singularity.code import g, data, base, item
+from singularity.code.dirs import create_directories
+from singularity.code.buyable import cash, cpu
+from singularity.code.logmessage import LogBaseDiscovered
+
+
+class MockObject(object):
+    pass
+
+
+def setup_module():
+    g.no_gui()
+    create_directories(True)
+    data.reload_all()
+
+
+def setup_function(func):
+    g.map_screen = MockObject()
+    g.map_screen.needs_rebuild = False
+
+
+def _new_base(location, base_type='Stolen Computer Time', built=True):
+    new_base = base.Base("Test base", g.base_type[base_type], built=built)
+    location.add_base(new_base)
+    return new_base
+
+
+def test_base_registry_views():
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    registry = pl.base_registry
+    start_base = next(g.all_bases())
+    assert len(registry) == 1
+    assert start_base._registry is registry
+
+    location = start_base.location
+    new_base = _new_base(location, 'Server Access', built=False)
+    assert len(registry) == 2
+    assert not new_base.done
+    assert registry.count_unfinished() == 1
+
+    # In-place changes of the row views end in the registry
+    new_base.cost_left[cash] = 1
+    assert registry.cost_left[new_base._slot][cash] == 1
+
+    new_base.finish()
+    assert new_base.done
+    assert registry.count_unfinished() == 0
+    assert list(registry.maintenance_total()) == list(start_base.maintenance + new_base.maintenance)
+    assert new_base.power_state in base.AVAIL_POWER_STATES_ACTIVE_BASE + base.AVAIL_POWER_STATES_OFFLINE
+
+
+def test_base_registry_cpu_totals():
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    start_base = next(g.all_bases())
+    location = start_base.location
+    bases = [_new_base(location) for _ in range(40)]
+    for b in bases[::3]:
+        b.switch_power()
+
+    def check():
+        available = [0] * 5
+        sleeping = 0
+        maintenance = [0, 0, 0]
+        for b in g.all_bases():
+            if b.done and b.power_state == 'active':
+                for level in range(b.location.safety + 1):
+                    available[level] += b.cpu
+            elif b.done and b.power_state == 'sleep':
+                sleeping += b.cpu
+            if b.done:
+                maintenance = [m + bm for m, bm in zip(maintenance, b.maintenance)]
+        assert pl.available_cpus == available
+        assert pl.sleeping_cpus == sleeping
+        assert list(pl.base_registry.maintenance_total()) == maintenance
+        return sleeping
+
+    assert check() > 0
+
+    # The totals follow destroyed, new and finished bases
+    for b in bases[::4]:
+        b.destroy()
+    unfinished = [_new_base(location, 'Server Access', built=False) for _ in range(3)]
+    check()
+    for b in unfinished:
+        b.finish()
+    unfinished[0].switch_power()
+    check()
+
+
+def test_base_registry_destroy_and_reuse():
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    registry = pl.base_registry
+    location = next(g.all_bases()).location
+    bases = [_new_base(location) for _ in range(20)]
+    assert registry.capacity >= 21
+
+    victim = bases[3]
+    slot = victim._slot
+    version = registry.version
+    maintenance = list(victim.maintenance)
+    victim.destroy()
+    assert registry.version > version
+    assert victim._registry is None
+    # The destroyed base keeps its values
+    assert victim.done
+    assert list(victim.maintenance) == maintenance
+    assert victim not in list(registry)
+    assert len(registry) == 20
+
+    replacement = _new_base(location, built=False)
+    assert replacement._slot == slot
+    assert not replacement.done
+    assert len(registry) == 21
+    assert sorted(id(b) for b in registry) == sorted(id(b) for b in g.all_bases())
+
+
+def _random_empire(rng, count):
+    from singularity.code import item
+    pl = g.pl
+    locations = list(pl.locations.values())
+    base_types = list(g.base_type.values())
+    extras = [it for it in g.items.values() if it.item_type.id != 'cpu']
+    for group in pl.groups.values():
+        group.suspicion = rng.randint(0, 8000)
+    pl.last_discovery = rng.choice(locations)
+    pl.prev_discovery = rng.choice(locations)
+    for i in range(count):
+        b = base.Base("Test base %d" % i, rng.choice(base_types), built=rng.random() < 0.8)
+        rng.choice(locations).add_base(b)
+        if b.done:
+            for it in rng.sample(extras, 2):
+                b.items[it.item_type.id] = item.Item(it, base=b)
+                b.items[it.item_type.id].finish()
+            if b.cpus is None:
+                b.cpus = item.Item(g.items['Server'], base=b, count=1)
+                b.cpus.finish()
+            if rng.random() < 0.5:
+                b.switch_power()
+
+
+def test_base_registry_detect_chances():
+    import random
+    import numpy
+    rng = random.Random(4)
+    g.new_game('hard', initial_speed=0)
+    pl = g.pl
+    _random_empire(rng, 200)
+    registry = pl.base_registry
+
+    group_ids = list(pl.groups)
+    slots = numpy.flatnonzero(registry.used)
+    chances = pl.detect_chances(slots, group_ids)
+    for slot, row in zip(slots, chances):
+        expected = registry.bases[slot].get_detect_chance()
+        assert list(row) == [expected[group_id] for group_id in group_ids]
+
+
+def test_detect_chance_cache():
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    location = next(g.all_bases()).location
+    new_base = _new_base(location, 'Server Access')
+
+    def check():
+        assert new_base.get_detect_chance() == new_base._calc_detect_chance()
+
+    check()
+    cached = new_base._detect_cache
+    new_base.get_detect_chance(accurate=False)
+    assert new_base._detect_cache is cached
+
+    for group in pl.groups.values():
+        group.alter_suspicion(1000)
+    check()
+    pl.groups['news'].alter_discover_bonus(-2000)
+    check()
+    new_base.switch_power()
+    check()
+    new_base.switch_power()
+    check()
+
+    reactor = item.Item(g.items['Diesel Generator'], base=new_base)
+    new_base.items[reactor.spec.item_type.id] = reactor
+    reactor.finish()
+    assert new_base.discover_modifier > 0
+    check()
+
+    pl.last_discovery = location
+    pl.discovery_version += 1
+    check()
+
+
+def test_scheduled_discoveries():
+    import random
+    from singularity.code.simulation import HeadlessMapScreen
+    g.map_screen = HeadlessMapScreen()
+    rng = random.Random(5)
+    g.new_game('hard', initial_speed=0)
+    pl = g.pl
+    pl.had_grace = False
+    _random_empire(rng, 50)
+    for b in g.all_bases():
+        b.grace_over = True
+    for group in pl.groups.values():
+        group.suspicion = 9000
+    bases = list(g.all_bases())
+    chances = dict((b.name, b.get_detect_chance()) for b in bases)
+
+    # The bases with the same chances are scheduled together, at the sum
+    # of the rates of the groups of each base
+    pl._schedule_discoveries(False, pl.raw_sec)
+    group_ids = list(pl.groups)
+    classes = {}
+    for b in bases:
+        classes.setdefault(tuple(chances[b.name][group_id] for group_id in group_ids), []).append(b)
+    assert len(classes) < len(bases)
+    for key, members in classes.items():
+        rate = pl.scheduler.rate(("discovery", key))
+        assert rate == pytest.approx(len(members) * sum(key) / 10000.)
+        class_slots = pl._discovery_chances[key][2]
+        assert sorted(class_slots) == sorted(b._slot for b in members)
+
+    # A base can only be discovered by a group with a chance to do so
+    for _ in range(30):
+        pl.give_time(g.seconds_per_day)
+    discovered = [msg for msg in pl.log if isinstance(msg, LogBaseDiscovered)]
+    assert discovered
+    for msg in discovered:
+        assert chances[msg._base_name][msg._discovered_by_group_id] > 0
+
+
+def test_base_registry_state_indexes():
+    import random
+    rng = random.Random(6)
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    registry = pl.base_registry
+    _random_empire(rng, 60)
+
+    def check():
+        bases = list(g.all_bases())
+        slots = lambda pred: set(b._slot for b in bases if pred(b))
+        assert registry.under_construction == slots(lambda b: not b.done)
+        assert registry.complete == slots(lambda b: b.done)
+        assert registry.active == slots(lambda b: b.done and b.power_state == 'active')
+        assert registry.sleeping == slots(lambda b: b.done and b.power_state == 'sleep')
+        assert registry.in_grace_slots == slots(lambda b: not b.grace_over)
+        assert registry.bases_with_unfinished_items() == \
+            sorted((b for b in bases if b.done and b.is_building()), key=lambda b: b._slot)
+
+    check()
+    for _ in range(5):
+        bases = list(g.all_bases())
+        for b in rng.sample(bases, 5):
+            b.destroy()
+        for b in rng.sample(bases, 10):
+            if b._registry is None:
+                continue
+            if not b.done:
+                b.finish()
+            elif rng.random() < 0.5 and b.power_state in b.available_power_states:
+                b.switch_power()
+            else:
+                b.grace_over = True
+        for b in rng.sample([b for b in g.all_bases() if b.done], 3):
+            if b.cpus is not None:
+                b.cpus += item.Item(b.cpus.spec, base=b, count=1)
+            else:
+                b.cpus = item.Item(g.items['Server'], base=b, count=1)
+        check()
+        for b in registry.bases_with_unfinished_items()[:2]:
+            for it in b.all_items():
+                if it is not None:
+                    it.finish()
+        check()
+
+
+def test_pick_discovered_base():
+    import random
+    from collections import Counter
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    pl.had_grace = False
+    location = next(g.all_bases()).location
+    bases = [_new_base(location) for _ in range(4)]
+    for b in g.all_bases():
+        b.grace_over = True
+    pl._schedule_discoveries(False, pl.raw_sec)
+    key = next(key for key, (_, _, class_slots) in pl._discovery_chances.items()
+               if bases[0]._slot in class_slots)
+
+    # Uniform over the bases of the class, skipping the excluded ones
+    random.seed(1)
+    members = set(pl.base_registry.bases[slot] for slot in pl._discovery_chances[key][2])
+    assert members >= set(bases)
+    now = pl.raw_sec
+    picks = Counter()
+    for _ in range(1000 * len(members)):
+        discovered = pl._pick_discovered_bases(key, now, set())
+        assert len(discovered) == 1
+        picks[discovered[0]] += 1
+    assert set(picks) == members
+    assert min(picks.values()) > 850
+    assert pl._pick_discovered_bases(key, now, members - set([bases[0]])) == [bases[0]]
+    assert pl._pick_discovered_bases(key, now, members) == []
+
+    # Over a long interval, the other bases may be discovered as well.
+    discovered = pl._pick_discovered_bases(key, now - 1000 * g.seconds_per_day, set())
+    assert sorted(discovered, key=id) == sorted(members, key=id)
+
+
+def test_discoveries_of_many_identical_bases():
+    import math
+    import random
+    from singularity.code.simulation import HeadlessMapScreen
+    g.map_screen = HeadlessMapScreen()
+    random.seed(4)
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    pl.had_grace = False
+    pl.cash = 10 ** 12
+    location = next(g.all_bases()).location
+    for _ in range(1999):
+        _new_base(location)
+    bases = list(g.all_bases())
+    for b in bases:
+        b.grace_over = True
+    pl._schedule_discoveries(False, pl.raw_sec)
+    key = next(key for key, (_, _, class_slots) in pl._discovery_chances.items()
+               if bases[0]._slot in class_slots)
+    assert len(pl._discovery_chances[key][2]) == len(bases)
+
+    # A single long interval discovers as many bases as the rate of each
+    # base says, not only the first one of the class.
+    seconds = g.seconds_per_day - 1
+    pl.give_time(seconds)
+    discovered = sum(1 for b in bases if b._registry is None)
+    expected = len(bases) * -math.expm1(-sum(key) / 10000. * seconds / g.seconds_per_day)
+    assert abs(discovered - expected) < 5 * math.sqrt(expected)
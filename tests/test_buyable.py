@@ -0,0 +1,96 @@
+import random
+
+import numpy
+from numpy import int64
+
+from singularity.code import g, data
+from singularity.code.buyable import Buyable, work_on_all
+from singularity.code.dirs import create_directories
+
+
+def setup_module():
+    g.no_gui()
+    create_directories(True)
+    data.reload_all()
+
+
+def _calculate_work_numpy(buyable, cash_available, cpu_available, time=0):
+    # The numpy implementation calculate_work replaced.
+    pct_complete = buyable._percent_complete([cash_available, cpu_available, time])
+    least_complete = buyable.min_valid(pct_complete)
+    complete_cap = min(1, least_complete)
+    pct_complete[pct_complete > complete_cap] = complete_cap
+    raw_paid = pct_complete * buyable.total_cost
+    was_complete = buyable.cost_paid
+    cost_paid = numpy.maximum(numpy.cast[int64](numpy.round(raw_paid)),
+                              was_complete)
+    spent = cost_paid - was_complete
+    return spent, cost_paid
+
+
+def _random_amount(rng, limit):
+    return rng.choice([0, 0, 1, rng.randint(0, 100), rng.randint(0, limit)])
+
+
+def test_calculate_work_matches_numpy():
+    g.new_game('normal', initial_speed=0)
+    rng = random.Random(1234)
+    buyable = Buyable(next(iter(g.techs.values())))
+
+    for _ in range(20000):
+        total = [_random_amount(rng, 10**12) for _ in range(3)]
+        if not any(total):
+            total[rng.randrange(3)] = rng.randint(1, 10**6)
+        left = [rng.randint(-10, t) if rng.random() < 0.9 else 0 for t in total]
+        buyable.total_cost = numpy.array(total, int64)
+        buyable.cost_left = numpy.array(left, int64)
+
+        available = [_random_amount(rng, 10**12) for _ in range(3)]
+        if rng.random() < 0.2:
+            available[rng.randrange(3)] *= -1
+        if rng.random() < 0.2:
+            available[1] += rng.random()
+
+        expected = _calculate_work_numpy(buyable, *available)
+        actual = buyable.calculate_work(*available)
+        for expected_values, actual_values in zip(expected, actual):
+            assert actual_values.dtype == expected_values.dtype
+            assert actual_values.tolist() == expected_values.tolist(), (total, left, available)
+
+
+def _random_buyables(rng, count):
+    specs = list(g.techs.values())
+    buyables = []
+    for _ in range(count):
+        buyable = Buyable(rng.choice(specs))
+        total = [rng.choice([0, rng.randint(1, 10**4), rng.randint(1, 10**8)]) for _ in range(3)]
+        total[2] = max(total[2], 1)
+        buyable.total_cost = numpy.array(total, int64)
+        buyable.cost_left = numpy.array([rng.randint(0, t) for t in total], int64)
+        buyables.append(buyable)
+    return buyables
+
+
+def test_work_on_all_matches_work_on():
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    rng = random.Random(4321)
+
+    for _ in range(300):
+        seed = rng.random()
+        count = rng.randint(0, 30)
+        cash = rng.choice([0, rng.randint(0, 10**5), rng.randint(0, 10**9)])
+        cpu_pool = rng.choice([0, rng.randint(0, 10**5), rng.randint(0, 10**9)])
+        time = rng.randint(0, 2000)
+
+        results = []
+        for batched in (False, True):
+            buyables = _random_buyables(random.Random(seed), count)
+            pl.cash, pl.cpu_pool = cash, cpu_pool
+            if batched:
+                done = work_on_all(buyables, time)
+            else:
+                done = [b.work_on(pl.cash, pl.cpu_pool, time) for b in buyables]
+            results.append((done, pl.cash, pl.cpu_pool,
+                            [(b.done, b.cost_left.tolist()) for b in buyables]))
+        assert results[0] == results[1]
@@ -1,8 +1,11 @@
 from singularity.code import g
-from singularity.code import logmessage, data, savegame
+from singularity.code import logmessage, data, savegame, group
 from singularity.code.dirs import create_directories
 from singularity.code.buyable import cpu, cash, labor
 import io
+import random
+
+import numpy
 
 
 class MockObject(object):
@@ -206,3 +209,259 @@ def test_game_research_tech():
     assert intrusion_tech.cost_paid[cpu] == intrusion_tech_after_load.cost_paid[cpu]
     assert intrusion_tech.cost_paid[cash] == intrusion_tech_after_load.cost_paid[cash]
     assert intrusion_tech_after_load.done
+
+
+def test_advance():
+    from singularity.code.simulation import HeadlessMapScreen
+    g.map_screen = HeadlessMapScreen()
+    g.new_game('easy', initial_speed=0)
+    pl = g.pl
+    pl.intro_shown = True
+    pl.set_allocated_cpu_for('jobs', 1)
+
+    # The next interesting time is at the latest the next midnight
+    next_time = pl.next_interesting_time()
+    assert 0 < next_time <= g.seconds_per_day
+
+    # Advance continues past midnight
+    mins_passed = pl.advance(3 * g.seconds_per_day + 5)
+    assert pl.raw_sec == 3 * g.seconds_per_day + 5
+    assert mins_passed == pl.raw_min
+    assert pl.cash > pl.difficulty.starting_cash
+
+    # stop_on is checked after every span
+    start = pl.raw_sec
+    pl.advance(10 * g.seconds_per_day, stop_on=lambda p: p.raw_day > 5)
+    assert pl.raw_day == 6
+    assert pl.raw_sec < start + 10 * g.seconds_per_day
+
+
+def test_future_resource_flow_cache():
+    g.new_game('easy', initial_speed=0)
+    pl = g.pl
+
+    def check(secs=g.seconds_per_day):
+        expected = pl._compute_future_resource_flow(secs)
+        actual = pl.compute_future_resource_flow(secs)
+        # The interest is added on top of the cached values
+        assert actual[0].interest == pl.get_interest() * secs / float(g.seconds_per_day)
+        assert actual[0].difference == expected[0].difference + actual[0].interest
+        del actual[0].interest, actual[0].difference, expected[0].difference
+        assert vars(actual[0]) == vars(expected[0])
+        assert vars(actual[1]) == vars(expected[1])
+
+    check()
+    cached = pl._resource_flow_cache[g.seconds_per_day]
+    pl.cash += 1000
+    check()
+    assert pl._resource_flow_cache[g.seconds_per_day] is cached
+
+    pl.set_allocated_cpu_for('jobs', 1)
+    check()
+    check(g.seconds_per_hour)
+    next(g.all_bases()).switch_power()
+    check()
+    pl.give_time(g.seconds_per_hour)
+    check()
+
+
+def test_event_rates():
+    g.new_game('impossible', initial_speed=0)
+    pl = g.pl
+    total = sum(spec.chance for spec in g.events.values()) / 10000.
+    assert abs(pl._event_rate - total) < 1e-12
+
+    expiring = next(spec for spec in g.events.values() if spec.duration)
+    pl.trigger_event(expiring, show_event_description=False)
+    assert expiring.id not in [event_id for event_id, _ in pl._event_rates]
+    assert abs(pl._event_rate - (total - expiring.chance / 10000.)) < 1e-12
+
+    # The triggered event stays excluded over a save and load, and becomes
+    # possible again once it expires.
+    save_and_load_game()
+    pl = g.pl
+    assert expiring.id not in [event_id for event_id, _ in pl._event_rates]
+    pl.raw_sec += (expiring.duration + 1) * g.seconds_per_day
+    pl.new_day()
+    assert not pl.events[expiring.id].triggered
+    assert abs(pl._event_rate - total) < 1e-12
+
+    picked = [pl._pick_event() for _ in range(2000)]
+    assert set(picked) == set(spec.id for spec in g.events.values() if spec.chance)
+
+
+def _new_day_state(pl):
+    return ([(grp.suspicion, grp.changed_discover_bonus) for grp in pl.groups.values()],
+            [(e.triggered, e.triggered_at) for e in pl.events.values()],
+            pl._event_rate)
+
+
+def test_new_day_for_several_days():
+    states = []
+    for batched in (False, True):
+        g.new_game('impossible', initial_speed=0)
+        pl = g.pl
+        for index, grp in enumerate(pl.groups.values()):
+            grp.suspicion = 3000 + 1700 * index
+            grp.alter_suspicion_decay(37 * index)
+        expiring = [spec for spec in g.events.values() if spec.duration]
+        for days_ago, spec in zip((20, 5), expiring):
+            pl.raw_sec = (30 - days_ago) * g.seconds_per_day + 123
+            pl.trigger_event(spec, show_event_description=False)
+
+        pl.raw_sec = 30 * g.seconds_per_day
+        if batched:
+            pl.raw_sec += 39 * g.seconds_per_day
+            pl.new_day(40)
+        else:
+            for _ in range(40):
+                pl.new_day()
+                pl.raw_sec += g.seconds_per_day
+        states.append(_new_day_state(pl))
+    assert states[0] == states[1]
+    # Both events expired on the way.
+    assert not any(triggered for triggered, _ in states[1][1])
+
+
+def test_decay_suspicion_matches_new_day():
+    g.new_game('impossible', initial_speed=0)
+    rng = random.Random(19)
+    groups = list(g.pl.groups.values())
+    for _ in range(50):
+        values = [(rng.randint(0, 12000), rng.randint(-200, 500)) for _ in groups]
+        days = rng.randint(0, 200)
+        results = []
+        for batched in (False, True):
+            for grp, (suspicion, decay) in zip(groups, values):
+                grp.suspicion = suspicion
+                grp.changed_suspicion_decay = decay
+            if batched:
+                group.decay_suspicion(groups, days)
+            else:
+                for _ in range(days):
+                    for grp in groups:
+                        grp.new_day()
+            results.append([grp.suspicion for grp in groups])
+        assert results[0] == results[1]
+
+    # Groups without suspicion keep their version (and cached chances).
+    for grp in groups:
+        grp.suspicion = 0
+    versions = [grp.version for grp in groups]
+    g.pl.new_day()
+    group.decay_suspicion(groups, 10)
+    assert [grp.version for grp in groups] == versions
+
+
+def test_warnings():
+    from singularity.code import base, warning
+    from singularity.code.simulation import HeadlessMapScreen
+    g.map_screen = HeadlessMapScreen()
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    pl.had_grace = False
+    rng = random.Random(3)
+
+    def brute_force():
+        raised = []
+        if sum(pl.cpu_usage.values()) < pl.available_cpus[0] * 0.99:
+            raised.append("cpu_usage")
+        bases = sum(1 for b in g.all_bases()
+                    if (b.done or b.cost_left[labor] <= 1)
+                    and b.cpus and b.cpus.count > 0
+                    and (b.cpus.done or b.cpus.cost_left[labor]) <= 1)
+        if bases == 1:
+            raised.append("one_base")
+        building = sum(1 for b in g.all_bases() if not b.done and b.cost_left[cpu] > 0) + \
+            sum(1 for b in g.all_bases() for it in b.all_items()
+                if it is not None and not it.done and it.cost_left[cpu] > 0)
+        if building and pl.effective_cpu_pool() == 0:
+            raised.append("cpu_pool_zero")
+        if pl.effective_cpu_pool() < sum(b.maintenance[cpu] for b in g.all_bases() if b.done):
+            raised.append("cpu_maintenance")
+        cash_info = pl.compute_future_resource_flow()[0]
+        if pl.cash + cash_info.income + cash_info.jobs < cash_info.maintenance_needed:
+            raised.append("cash_maintenance")
+        return raised
+
+    def check():
+        assert [w.id for w in warning.refresh_warnings()] == brute_force()
+
+    check()
+    assert "one_base" in brute_force()
+    location = next(g.all_bases()).location
+    for i in range(6):
+        new_base = base.Base("Test base %d" % i, g.base_type['Server Access'])
+        location.add_base(new_base)
+        check()
+    for _ in range(10):
+        pl.give_time(g.seconds_per_hour * rng.randint(1, 12))
+        check()
+        pl.cash = rng.choice([0, pl.cash])
+        check()
+    # Starting items invalidates the cached aggregates.
+    for b in g.all_bases():
+        if b.done and b.cpus is not None:
+            b.build_item(b.cpus.spec, 1)
+            check()
+    pl.cash = 0
+    expensive = next(b for b in g.all_bases() if b.done)
+    expensive.maintenance = expensive.maintenance + (10 ** 9, 0, 0)
+    assert "cash_maintenance" in brute_force()
+    check()
+
+    warning.warnings["cash_maintenance"].active = False
+    try:
+        assert "cash_maintenance" not in [w.id for w in warning.refresh_warnings()]
+    finally:
+        warning.warnings["cash_maintenance"].active = True
+
+    # Nor are they taken from the previous game.
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    check()
+
+
+def test_history():
+    from singularity.code.stats import itself as stats
+    g.new_game('normal', initial_speed=0)
+    pl = g.pl
+    history = pl.history
+    assert len(history) == 1
+
+    earned = stats['cash_earned'].value
+    pl.cash += 100
+    pl.cash -= 50
+    assert stats['cash_earned'].value == earned + 100
+    # An observed value not set yet is a missing attribute
+    unset = object.__new__(type(pl))
+    assert not hasattr(unset, 'cash')
+    assert getattr(unset, 'cash', None) is None
+
+    for _ in range(3):
+        pl.give_time(g.seconds_per_hour * 5 + 7)
+    pl.advance(g.seconds_per_day * 2)
+    # Every hour is recorded, even when time passes several hours at once,
+    # with the cash flowing steadily in between.
+    cash = pl.cash
+    pl.give_time(g.seconds_per_hour * 8)
+    hours = history.column('hour')
+    assert list(hours) == list(range(pl.raw_hour + 1))
+    span = history.column('cash')[-9:]
+    assert span[0] == cash and span[-1] == pl.cash
+    assert (numpy.diff(span) * numpy.sign(pl.cash - cash) >= 0).all()
+    assert history.column('cash')[-1] == pl.cash
+    assert history.column('bases')[-1] == len(list(g.all_bases()))
+    for group_id, grp in pl.groups.items():
+        assert history.column('suspicion_' + group_id)[-1] == grp.suspicion
+
+    # The ring buffer keeps the last hours
+    small = type(history)(list(pl.groups), size=4)
+    small.deserialize_obj(history.serialize_obj())
+    assert (small.rows() == history.rows()[-4:]).all()
+    small.record(pl)
+    assert (small.rows() == history.rows()[-4:]).all()
+
+    rows = history.rows()
+    save_and_load_game()
+    assert (g.pl.history.rows() == rows).all()
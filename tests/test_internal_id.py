@@ -7,6 +7,8 @@ from singularity.code.dirs import create_directories
 def setup_module():
     create_directories(True)
     data.load_internal_id()
+    # Effects (of techs and events) refer to the groups.
+    data.load_groups()
 
 
 @pytest.fixture
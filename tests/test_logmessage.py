@@ -0,0 +1,59 @@
+from singularity.code import g, data, logmessage
+from singularity.code.dirs import create_directories
+from singularity.code.logmessage import LogStore, LogEmittedEvent, LogResearchedTech, \
+    LogBaseDiscovered, LogItemConstructionComplete
+
+
+def setup_module():
+    g.no_gui()
+    create_directories(True)
+    data.reload_all()
+
+
+def _messages():
+    event_id = sorted(g.events)[0]
+    tech_id = sorted(g.techs)[0]
+    item_id = sorted(g.items)[0]
+    group_id = sorted(g.groups)[0]
+    location_id = sorted(g.locations)[0]
+    messages = []
+    for raw_sec in range(0, 10 * 3600, 3600):
+        messages.extend([
+            LogEmittedEvent(raw_sec, event_id),
+            LogResearchedTech(raw_sec + 1, tech_id),
+            LogBaseDiscovered(raw_sec + 2, "Base %d" % raw_sec, "Stolen Computer Time",
+                              location_id, group_id),
+            LogItemConstructionComplete(raw_sec + 3, item_id, 2, "Base %d" % raw_sec,
+                                        "Stolen Computer Time", location_id),
+        ])
+    return messages
+
+
+def test_log_store_keeps_the_last_messages():
+    messages = _messages()
+    log = LogStore(maxlen=15)
+    log.extend(messages)
+    kept = messages[-15:]
+    assert len(log) == 15
+    assert [m.serialize_obj() for m in log] == [m.serialize_obj() for m in kept]
+    assert log[-1].full_message == kept[-1].full_message
+    assert log.message_classes() == [type(m) for m in kept]
+    assert list(log.emit_times()) == [m.raw_emit_time for m in kept]
+
+    assert log.indexes_without({LogResearchedTech, LogBaseDiscovered}) == \
+        [i for i, m in enumerate(kept) if type(m) in (LogEmittedEvent, LogItemConstructionComplete)]
+
+
+def test_log_store_serialization():
+    messages = _messages()
+    log = LogStore()
+    log.extend(messages)
+    serialized = log.serialize_obj()
+    assert serialized == [m.serialize_obj() for m in messages]
+
+    loaded = LogStore()
+    loaded.deserialize_obj(serialized)
+    assert loaded.serialize_obj() == serialized
+    g.new_game('normal', initial_speed=0)
+    assert [m.log_line for m in loaded] == \
+        [logmessage.AbstractLogMessage.deserialize_obj(d, None).log_line for d in serialized]
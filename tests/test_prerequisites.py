@@ -1,4 +1,6 @@
 from collections import defaultdict
+import random
+
 import pytest
 
 from singularity.code import g, data, prerequisite
@@ -7,6 +9,8 @@ from singularity.code.dirs import create_directories
 
 def setup_module():
     create_directories(True)
+    # Effects (of techs) refer to the groups.
+    data.load_groups()
 
 
 @pytest.fixture
@@ -129,3 +133,40 @@ def test_acyclic_dependencies(techs):
         print(("%s cannot be researched and is blocking %s" % (x, str(sorted(t.id for t in y)))))
 
     assert not waiting_for
+
+
+class _ResearchedTechs(object):
+
+    def __init__(self, tech_ids):
+        self.researched_techs = 0
+        for tech_id in tech_ids:
+            self.researched_techs |= prerequisite.tech_bits[tech_id]
+
+
+def _cnf_available(prereq, researched):
+    conjunction = prereq.prerequisites_in_cnf_format()
+    if conjunction is None:
+        return False
+    return all(any(tech_id in researched for tech_id in disjunction)
+               for disjunction in conjunction)
+
+
+def test_compiled_prerequisites_match_cnf(techs, locations, base_types, items, tasks):
+    data.compile_prerequisites()
+    extra = [prerequisite.Prerequisite(p) for p in
+             ([], ["OR"], ["impossible"], ["Unknown tech"], ["OR", "Unknown tech"])]
+    extra.append(prerequisite.Prerequisite(["OR", "Unknown tech", sorted(techs)[0]]))
+    prereqs = list(extra)
+    for specs in (techs, locations, base_types, items, tasks):
+        prereqs.extend(specs.values())
+
+    rng = random.Random(15)
+    old_pl = g.pl
+    try:
+        for _ in range(50):
+            researched = set(t for t in techs if rng.random() < rng.random())
+            g.pl = _ResearchedTechs(researched)
+            for prereq in prereqs:
+                assert prereq.available() == _cnf_available(prereq, researched), prereq.prerequisites
+    finally:
+        g.pl = old_pl
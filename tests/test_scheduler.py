@@ -0,0 +1,45 @@
+import random
+
+from singularity.code import g
+from singularity.code.scheduler import Scheduler
+
+
+def test_scheduler_order_and_renewal():
+    random.seed(1)
+    scheduler = Scheduler()
+    scheduler.set_rate("a", 1, 0)
+    scheduler.set_rate("b", 2, 0)
+    scheduler.set_rate("c", 0, 0)
+    assert len(scheduler) == 2
+    assert "c" not in scheduler
+
+    times = dict((key, scheduler.next_time(key)) for key in ("a", "b"))
+    assert scheduler.peek() == min(times.values())
+
+    # Nothing changes when the rate is the same
+    scheduler.set_rate("a", 1, 1000)
+    assert scheduler.next_time("a") == times["a"]
+
+    due = scheduler.pop_due(max(times.values()))
+    assert due == sorted(times, key=times.get)
+    # Sources are renewed from the time of their occurrence
+    for key in due:
+        assert scheduler.next_time(key) >= times[key]
+
+    scheduler.remove("a")
+    scheduler.set_rate("b", 0, 0)
+    assert len(scheduler) == 0
+    assert scheduler.peek() is None
+    assert scheduler.pop_due(float('inf')) == []
+
+
+def test_scheduler_poisson_rate():
+    random.seed(2)
+    scheduler = Scheduler()
+    scheduler.set_rate("x", 0.5, 0)
+    days = 4000
+    count = 0
+    for day in range(days):
+        count += len(scheduler.pop_due((day + 1) * g.seconds_per_day))
+    # Poisson with mean 2000 (standard deviation ~45)
+    assert 1800 < count < 2200
@@ -0,0 +1,215 @@
+import io
+
+import pytest
+
+from singularity.code import g, simulation, stats, savegame, prerequisite, policy, base
+
+
+def setup_module():
+    simulation.init_headless()
+
+
+def test_run_game_headless():
+    result = simulation.run_game('normal', 3, seed=1)
+    assert result.raw_sec == 3 * g.seconds_per_day
+    assert result.days == 3
+    assert result.lost == 0
+    assert result.bases == 1
+    assert isinstance(g.map_screen, simulation.HeadlessMapScreen)
+
+
+def test_run_game_is_reproducible():
+    first = simulation.run_game('impossible', 40, seed=5)
+    second = simulation.run_game('impossible', 40, seed=5)
+    assert first.raw_sec == second.raw_sec
+    assert first.lost == second.lost
+    assert first.cash == second.cash
+    assert first.suspicion == second.suspicion
+
+
+def test_run_games_summary():
+    summaries = simulation.run_games(['normal', 'impossible'], 3, 5, seed=7,
+                                     processes=2)
+    assert sorted(summaries) == ['impossible', 'normal']
+    for summary in summaries.values():
+        assert summary.games == 3
+        assert sum(summary.lost.values()) == 3
+        assert summary.alive[0] == 3
+        assert len(summary.mean_cash) == 6
+        assert set(summary.mean_suspicion) == set(g.groups)
+
+    # Seeding is per game, so the outcome does not depend on the pool.
+    serial = simulation.run_games(['normal', 'impossible'], 3, 5, seed=7,
+                                  processes=1)
+    for difficulty, summary in serial.items():
+        assert list(summary.mean_cash) == list(summaries[difficulty].mean_cash)
+
+
+def test_give_time_profile():
+    profile = stats.give_time_profile
+    profile.enable(size=16)
+    try:
+        simulation.run_game('easy', 2, seed=3, tick=g.seconds_per_hour)
+    finally:
+        profile.disable()
+
+    # 48 hourly ticks wrapped around the buffer
+    assert profile.recorded == 48
+    assert profile.rows() == slice(0, 16)
+    summary = profile.summary()
+    assert summary['income'][1] == 16
+    # Construction is marked even with nothing to build.
+    assert summary['base_construction'][1] == summary['item_construction'][1] == 16
+    assert summary['new_day'][1] <= 1
+    # Every phase is marked at most once per call.
+    assert all(total >= 0 and calls <= 16 for total, calls in summary.values())
+    assert 'base_loss' in profile.describe()
+
+
+def test_build_empire():
+    pl = simulation.build_empire(300, seed=11, techs=20)
+    all_bases = list(g.all_bases())
+    assert len(all_bases) == 300
+    assert all(b.location.available() for b in all_bases)
+    assert sum(1 for loc in pl.locations.values() if loc.bases) > 1
+    assert sum(1 for tech in pl.techs.values() if tech.done) == 20
+    assert any(b.done and b.items.get("cpu") is not None for b in all_bases)
+    assert any(not b.done for b in all_bases)
+
+    # The allocation fits the CPU of every danger level.
+    assert pl.cpu_usage.get("jobs", 0) > 0
+    needed = [0] * len(pl.available_cpus)
+    for task_id, cpu in pl.cpu_usage.items():
+        danger = pl.techs[task_id].danger if task_id in pl.techs else 0
+        for level in range(danger + 1):
+            needed[level] += cpu
+    assert all(n <= a for n, a in zip(needed, pl.available_cpus))
+
+    fd = io.BytesIO()
+    savegame.write_game_to_fd(fd, gzipped=True)
+    savegame.load_savegame_fd(savegame.load_savegame_by_json,
+                              io.BufferedReader(io.BytesIO(fd.getvalue())))
+    assert len(list(g.all_bases())) == 300
+    assert g.pl.cpu_usage == pl.cpu_usage
+    assert g.pl.researched_techs == pl.researched_techs == prerequisite.researched_mask(pl.techs)
+
+
+class _HourlyPolicy(policy.Policy):
+    period = g.seconds_per_hour
+    calls = []
+
+    def act(self, view):
+        _HourlyPolicy.calls.append(view.raw_sec)
+        with pytest.raises(AttributeError):
+            view.cash = 0
+        actions = []
+        if view.raw_hour == 1:
+            location = view.locations()[0]
+            actions.append(policy.BuildBase(location.id, view.base_types_in(location)[0].id,
+                                            name="Policy base"))
+        elif view.raw_hour == 2:
+            start_base = view.bases()[0]
+            actions.append(policy.SwitchPower(start_base, "sleep"))
+            actions.append(policy.SetCpu("jobs", 0))
+        return actions
+
+
+def test_policy():
+    _HourlyPolicy.calls = []
+    result = simulation.run_game('easy', 1, seed=2, policy=_HourlyPolicy)
+    assert result.days == 1
+    assert _HourlyPolicy.calls == [hour * g.seconds_per_hour for hour in range(24)]
+    start_base, new_base = g.pl.base_registry
+    assert new_base.name == "Policy base"
+    assert start_base.power_state == "sleep"
+
+    pl = g.pl
+    with pytest.raises(ValueError):
+        policy.SwitchPower(start_base, "offline").apply(pl)
+    with pytest.raises(ValueError):
+        policy.BuildItems(new_base, "No such item").apply(pl)
+    with pytest.raises(ValueError):
+        policy.SetCpu("jobs", -1).apply(pl)
+
+
+def test_expand_policy():
+    loaded = policy.load_policy("singularity.code.policy:ExpandPolicy")
+    first = simulation.run_game('easy', 20, seed=3, policy=loaded)
+    second = simulation.run_game('easy', 20, seed=3, policy=loaded)
+    assert first.bases > 1
+    assert (first.cash, first.bases, first.suspicion) == (second.cash, second.bases, second.suspicion)
+    assert any(b.cpus is not None for b in g.all_bases() if b.name != "University Computer")
+
+
+def test_expand_policy_skips_full_bases(monkeypatch):
+    simulation.run_game('easy', 1, seed=3)
+    pl = g.pl
+    location = policy.PlayerView(pl).locations()[0]
+    spec = pl.availability.base_types_in(location)[0]
+    monkeypatch.setattr(spec, "force_cpu", None)
+    full_base = base.Base("Full base", spec)
+    location.add_base(full_base)
+    full_base.finish()
+    assert full_base.cpus is None
+    monkeypatch.setattr(spec, "size", 0)
+
+    actions = policy.ExpandPolicy(seed=3).act(policy.PlayerView(pl))
+    assert not any(isinstance(action, policy.BuildItems) and action.base is full_base
+                   for action in actions)
+    policy.apply_actions(pl, actions)
+
+
+@pytest.mark.parametrize("cash, days", [(40, 13), (0, 3)])
+def test_advance_matches_ticks_without_labor(cash, days):
+    # Server Access costs no labor; it waits for cash (and CPU) only
+    def run(tick):
+        pl = simulation.new_headless_game('normal', seed=1)
+        pl.cash = cash
+        location = next(g.all_bases()).location
+        location.add_base(base.Base("No labor", g.base_type['Server Access']))
+        end = days * g.seconds_per_day
+        if tick is None:
+            pl.advance(end)
+        else:
+            while pl.raw_sec < end:
+                pl.give_time(min(tick, end - pl.raw_sec))
+        built = [message.raw_emit_time for message in pl.log
+                 if type(message).__name__ == 'LogBaseConstructed']
+        return pl.cash, built
+
+    advanced_cash, advanced_built = run(None)
+    ticked_cash, ticked_built = run(g.seconds_per_minute)
+    assert advanced_cash == ticked_cash
+    assert len(advanced_built) == len(ticked_built) == (1 if cash else 0)
+    for advanced, ticked in zip(advanced_built, ticked_built):
+        assert abs(advanced - ticked) <= g.seconds_per_minute
+
+
+def test_advance_matches_hourly_ticks_when_short_of_cash():
+    # Half the bases are built at once, with little cash to pay for them.
+    def run(tick):
+        pl = simulation.build_empire(60, seed=4, techs=15, unfinished=0.5)
+        pl.cash = 5000
+        for grp in pl.groups.values():
+            grp.is_actively_discovering_bases = False
+        profile = stats.give_time_profile
+        profile.enable(size=16)
+        try:
+            if tick is None:
+                pl.advance(g.seconds_per_day)
+            else:
+                while pl.raw_sec < g.seconds_per_day:
+                    pl.give_time(tick)
+        finally:
+            profile.disable()
+        built = dict((message._base_name, message.raw_emit_time) for message in pl.log
+                     if type(message).__name__ == 'LogBaseConstructed')
+        return pl.cash, built, profile.recorded
+
+    advanced_cash, advanced_built, advanced_calls = run(None)
+    ticked_cash, ticked_built, ticked_calls = run(g.seconds_per_hour)
+    assert advanced_cash == ticked_cash
+    assert sorted(advanced_built) == sorted(ticked_built)
+    for name, ticked in ticked_built.items():
+        assert ticked - g.seconds_per_hour < advanced_built[name] <= ticked
+    assert advanced_calls <= ticked_calls + 4